@@ -0,0 +1,26 @@
+import json
+import os
+
+# --- SYNTHETIC COURSES ---
+# Course JSON in the same shape as the real API export: chapters -> lessons -> resources. Every lesson
+# holds one video and one document; resource ids start with their type so the stand-in server knows
+# which size to serve.
+def make_course(n_resources, lessons_per_chapter=10, title=None):
+    chapters, made = [], 0
+    while made < n_resources:
+        lessons = []
+        for _ in range(lessons_per_chapter):
+            if made >= n_resources: break
+            resources = []
+            for kind, ext in (('video', 'mp4'), ('document', 'pdf')):
+                if made >= n_resources: break
+                resources.append({'resource': {'type': kind, 'title': f"{kind} {made:05d}.{ext}", 'fileUrl': f"{kind}-{made:05d}"}, 'order': len(resources)})
+                made += 1
+            lessons.append({'lesson': {'title': f"Lesson {made:05d}", 'resources': resources}})
+        chapters.append({'title': f"Chapter {len(chapters) + 1}", 'lessons': lessons})
+    return {'course': {'title': title or f"Bench Course {n_resources}", 'chapters': chapters}}
+
+def write_course(directory, n_resources):
+    path = os.path.join(directory, f"course-{n_resources}.json")
+    with open(path, 'w', encoding='utf-8') as f: json.dump(make_course(n_resources), f)
+    return path
@@ -0,0 +1,171 @@
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, REPO_DIR)
+
+try: import resource
+except ImportError: resource = None  # Windows: peak RSS is not reported
+
+# --- OFFLINE BENCHMARK ---
+# Runs engine.run_download / engine.run_bulk_upload against the local stand-ins in stand_in.py, so
+# nothing touches the real API or YouTube. Every scenario runs in its own child process (peak RSS is a
+# per-process high-water mark) and the results are written to bench/results/ for later comparison.
+#
+#   python bench/run.py --sizes 10,100,1000 --latency-ms 20 --bandwidth-mbps 50 --error-rate 0.01
+#   python bench/run.py --sizes 100 --upload 10 --baseline latest
+#
+# Downloads still go through aria2c, which has to be on PATH.
+
+def percentile(values, pct):
+    if not values: return None
+    values = sorted(values); k = (len(values) - 1) * pct / 100; lo = int(k)
+    return values[lo] + (values[min(lo + 1, len(values) - 1)] - values[lo]) * (k - lo)
+
+def peak_rss_mb(who):
+    if resource is None: return None
+    kb = resource.getrusage(who).ru_maxrss
+    return round(kb / 1024 / (1024 if sys.platform == 'darwin' else 1), 1)  # bytes on macOS, KB elsewhere
+
+def latency_stats(started, finished):
+    latencies = [finished[k] - started[k] for k in finished if k in started]
+    return {'p50_latency_s': round(percentile(latencies, 50), 4) if latencies else None, 'p99_latency_s': round(percentile(latencies, 99), 4) if latencies else None}
+
+# --- CHILD: ONE SCENARIO ---
+def run_scenario(params):
+    import engine
+    import fixtures
+    import stand_in
+    server = stand_in.StandInServer(stand_in.StandInConfig(params['latency_ms'] / 1000, int(params['bandwidth_mbps'] * 1024 * 1024), params['error_rate'], params['video_kb'] * 1024, params['doc_kb'] * 1024)).start()
+    engine.BASE_PRESIGNED_URL, engine.BASE_DOC_URL = f"{server.base_url}/api/v1/files/presigned/", f"{server.base_url}/api/v1/files/"
+    workdir, cwd = tempfile.mkdtemp(prefix="edl-bench-"), os.getcwd()
+    bus, lock, started, finished = engine.EventBus(), threading.Lock(), {}, {}
+    @bus.subscribe
+    def on_event(event):
+        with lock:
+            if event['type'] == 'download.task' and event['state'] == 'downloading': started[event['task']['id']] = event['time']
+            elif event['type'] == 'download.task' and event['state'] == 'done': finished[event['task']['id']] = event['time']
+            elif event['type'] == 'upload.started': started[event['path']] = event['time']
+            elif event['type'] == 'upload.finished' and event['state'] == 'uploaded': finished[event['path']] = event['time']
+    try:
+        os.chdir(workdir)
+        if params['kind'] == 'download':
+            if not shutil.which('aria2c'): return {'error': "aria2c not found on PATH"}
+            json_path = fixtures.write_course(workdir, params['size'])
+            t0 = time.perf_counter(); plan = engine.load_course_plan(json_path); n_tasks = len(plan.tasks); plan_seconds = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+                summary = engine.run_download(json_path, "bench", workers=params['workers'], use_rpc=params['rpc'], events=bus)
+            wall = time.perf_counter() - t0
+            if summary is None: return {'error': "run_download did not start (is aria2c on PATH?)"}
+            done, failures = summary['done'], summary['failed']
+            nbytes = sum(os.path.getsize(os.path.join(t.save_dir, t.filename)) for t in plan.tasks if summary['states'].get(t.id) == 'done')
+            extra = {'tasks': n_tasks, 'plan_parse_s': round(plan_seconds, 4)}
+        else:
+            folder = os.path.join(workdir, "videos"); os.makedirs(folder)
+            block = os.urandom(1024 * 1024)
+            for i in range(params['size']):
+                with open(os.path.join(folder, f"bench {i:05d}.mp4"), 'wb') as f:
+                    for _ in range(params['upload_mb']): f.write(block)
+            youtube = stand_in.build_youtube_client(server.base_url)
+            t0 = time.perf_counter()
+            with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+                summary = engine.run_bulk_upload(youtube, "bench", folder, params['workers'], chunk_size_mb=params['chunk_mb'], events=bus)
+            wall = time.perf_counter() - t0
+            done, failures = summary['uploaded'], summary['failed']
+            nbytes, extra = done * params['upload_mb'] * 1024 * 1024, {}
+        return {**extra, 'wall_s': round(wall, 3), 'files': done, 'failed': failures, 'bytes': nbytes,
+                'files_per_s': round(done / wall, 2) if wall else None, 'mb_per_s': round(nbytes / 1024 / 1024 / wall, 2) if wall else None,
+                **latency_stats(started, finished), 'peak_rss_mb': peak_rss_mb(resource.RUSAGE_SELF) if resource else None,
+                'peak_child_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None}
+    finally:
+        os.chdir(cwd); server.stop(); shutil.rmtree(workdir, ignore_errors=True)
+
+# --- PARENT: SCENARIOS, RESULTS, COMPARISON ---
+COMPARED = (('files_per_s', 1), ('mb_per_s', 1), ('p50_latency_s', -1), ('p99_latency_s', -1), ('peak_rss_mb', -1))
+
+def git_commit():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception: return None
+
+def load_baseline(spec):
+    if spec == 'latest':
+        files = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.json")))
+        if not files: return None, None
+        spec = files[-1]
+    with open(spec, 'r', encoding='utf-8') as f: return spec, json.load(f)
+
+def print_row(name, r):
+    if 'error' in r: print(f"{name:<16} ❌ {r['error']}"); return
+    fmt = lambda v, width, digits: f"{v:>{width}.{digits}f}" if v is not None else f"{'-':>{width}}"
+    print(f"{name:<16} {r['files']:>6} {r['failed']:>5} {fmt(r['files_per_s'], 9, 2)} {fmt(r['mb_per_s'], 8, 2)} {fmt(r['p50_latency_s'], 8, 3)} {fmt(r['p99_latency_s'], 8, 3)} {fmt(r['peak_rss_mb'], 8, 1)}")
+
+def compare(baseline, scenarios):
+    before = {s['name']: s['result'] for s in baseline['scenarios']}
+    for s in scenarios:
+        old, new = before.get(s['name']), s['result']
+        if not old or 'error' in old or 'error' in new: continue
+        deltas = []
+        for key, sign in COMPARED:
+            if old.get(key) and new.get(key) is not None:
+                change = (new[key] - old[key]) / old[key] * 100
+                deltas.append(f"{key} {change:+.1f}%{' ⚠️' if change * sign < -10 else ''}")
+        print(f"  {s['name']:<14} " + ", ".join(deltas))
+
+def main():
+    p = argparse.ArgumentParser(description="Offline EDownloader benchmark against local API/YouTube stand-ins.")
+    p.add_argument('--sizes', default="10,100,1000", help="Comma-separated course sizes in resources (default: 10,100,1000)")
+    p.add_argument('--workers', type=int, default=4)
+    p.add_argument('--no-rpc', action='store_true', help="One aria2c process per file instead of the RPC daemon")
+    p.add_argument('--latency-ms', type=float, default=0, help="Added to every stand-in request")
+    p.add_argument('--bandwidth-mbps', type=float, default=0, help="Per-connection body rate in MB/s, 0 = unlimited")
+    p.add_argument('--error-rate', type=float, default=0, help="Fraction of presigned/upload requests answered with 503")
+    p.add_argument('--video-kb', type=int, default=2048)
+    p.add_argument('--doc-kb', type=int, default=256)
+    p.add_argument('--upload', type=int, default=0, metavar='N', help="Also benchmark a bulk upload of N videos")
+    p.add_argument('--upload-mb', type=int, default=4)
+    p.add_argument('--chunk-mb', type=float, default=1)
+    p.add_argument('--label', default="", help="Free-form tag stored with the results")
+    p.add_argument('--baseline', help="Results file to compare against, or 'latest'")
+    p.add_argument('--no-save', action='store_true')
+    p.add_argument('--scenario', help=argparse.SUPPRESS)  # internal: child process entry point
+    args = p.parse_args()
+    if args.scenario: print(json.dumps(run_scenario(json.loads(args.scenario)))); return
+
+    common = {'workers': args.workers, 'rpc': not args.no_rpc, 'latency_ms': args.latency_ms, 'bandwidth_mbps': args.bandwidth_mbps,
+              'error_rate': args.error_rate, 'video_kb': args.video_kb, 'doc_kb': args.doc_kb, 'upload_mb': args.upload_mb, 'chunk_mb': args.chunk_mb}
+    plans = [(f"download-{n}", {**common, 'kind': 'download', 'size': int(n)}) for n in args.sizes.split(',') if n.strip()]
+    if args.upload: plans.append((f"upload-{args.upload}", {**common, 'kind': 'upload', 'size': args.upload}))
+    baseline_path, baseline = load_baseline(args.baseline) if args.baseline else (None, None)
+
+    print(f"{'scenario':<16} {'files':>6} {'fail':>5} {'files/s':>9} {'MB/s':>8} {'p50 s':>8} {'p99 s':>8} {'RSS MB':>8}")
+    scenarios = []
+    for name, params in plans:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--scenario', json.dumps(params)], capture_output=True, text=True)
+        try: result = json.loads(proc.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError): result = {'error': (proc.stderr.strip().splitlines() or ["no output"])[-1]}
+        scenarios.append({'name': name, 'params': params, 'result': result}); print_row(name, result)
+
+    report = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': git_commit(), 'label': args.label, 'python': platform.python_version(), 'platform': platform.platform(), 'scenarios': scenarios}
+    if baseline:
+        print(f"\nCompared with {os.path.relpath(baseline_path)} ({baseline.get('commit')}):"); compare(baseline, scenarios)
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit'] or 'nogit'}.json")
+        with open(path, 'w', encoding='utf-8') as f: json.dump(report, f, indent=2)
+        print(f"\nResults saved to {os.path.relpath(path)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+# --- LOCAL STAND-INS FOR THE FILE API AND THE YOUTUBE UPLOAD ENDPOINT ---
+# One threaded HTTP server that imitates:
+#   GET  /api/v1/files/presigned/<id>      -> {"url": ".../blob/<id>"}   (BASE_PRESIGNED_URL)
+#   GET  /api/v1/files/<id>, /blob/<id>    -> file bytes, Range aware    (BASE_DOC_URL / presigned target)
+#   POST /upload/youtube/v3/videos         -> resumable session (Location header)
+#   PUT  /upload/session/<sid>             -> chunk upload, 308 until complete
+#   GET  /youtube/v3/channels|playlistItems -> an empty uploads playlist for the channel index
+# Every request waits `latency` seconds, bodies move at `bandwidth` bytes/s per connection and
+# `error_rate` of API/chunk requests fail with 503.
+_BLOCK = bytes(range(256)) * 4096
+
+class StandInConfig:
+    def __init__(self, latency=0.0, bandwidth=0, error_rate=0.0, video_size=2 * 1024 * 1024, doc_size=256 * 1024, seed=0):
+        self.latency, self.bandwidth, self.error_rate, self.video_size, self.doc_size = latency, bandwidth, error_rate, video_size, doc_size
+        self.random, self.lock = random.Random(seed), threading.Lock()
+    def should_fail(self):
+        with self.lock: return self.error_rate and self.random.random() < self.error_rate
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    def log_message(self, *args): pass
+    @property
+    def config(self): return self.server.config
+    def _send(self, code, body=b'', headers=None):
+        self.send_response(code)
+        for k, v in (headers or {}).items(): self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body))); self.end_headers()
+        if body and self.command != 'HEAD': self.wfile.write(body)
+    def _json(self, payload, code=200): self._send(code, json.dumps(payload).encode(), {'Content-Type': 'application/json'})
+    def _throttle(self, nbytes, started):
+        if self.config.bandwidth:
+            ahead = nbytes / self.config.bandwidth - (time.monotonic() - started)
+            if ahead > 0: time.sleep(ahead)
+    def _serve_file(self, file_id):
+        size = self.config.video_size if file_id.startswith('video') else self.config.doc_size
+        start, end, code = 0, size - 1, 200
+        m = re.match(r'bytes=(\d*)-(\d*)', self.headers.get('Range', ''))
+        if m:
+            start = int(m.group(1) or 0); end = min(int(m.group(2)) if m.group(2) else size - 1, size - 1); code = 206
+            if start >= size: return self._send(416, headers={'Content-Range': f'bytes */{size}'})
+        headers = {'Accept-Ranges': 'bytes', 'Content-Type': 'application/octet-stream', 'Content-Length': str(end - start + 1)}
+        if code == 206: headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        self.send_response(code)
+        for k, v in headers.items(): self.send_header(k, v)
+        self.end_headers()
+        if self.command == 'HEAD': return
+        sent, started, pos = 0, time.monotonic(), start
+        while pos <= end:
+            n = min(64 * 1024, end - pos + 1); offset = pos % len(_BLOCK)
+            chunk = _BLOCK[offset:offset + n] if offset + n <= len(_BLOCK) else (_BLOCK[offset:] + _BLOCK)[:n]
+            self.wfile.write(chunk); pos += n; sent += n; self._throttle(sent, started)
+    def do_HEAD(self): self.do_GET()
+    def do_GET(self):
+        url = urlsplit(self.path); path = url.path
+        if self.config.latency: time.sleep(self.config.latency)
+        if path.startswith('/api/v1/files/presigned/'):
+            if self.config.should_fail(): return self._json({'error': 'injected'}, 503)
+            file_id = path[len('/api/v1/files/presigned/'):]
+            return self._json({'url': f"http://127.0.0.1:{self.server.server_port}/blob/{file_id}"})
+        if path.startswith('/api/v1/files/'): return self._serve_file(path[len('/api/v1/files/'):])
+        if path.startswith('/blob/'): return self._serve_file(path[len('/blob/'):])
+        if path == '/youtube/v3/channels': return self._json({'items': [{'id': 'bench', 'contentDetails': {'relatedPlaylists': {'uploads': 'UUbench'}}}]})
+        if path == '/youtube/v3/playlistItems': return self._json({'items': []})
+        if path == '/youtube/v3/search': return self._json({'items': []})
+        self._send(404)
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.config.latency: time.sleep(self.config.latency)
+        if urlsplit(self.path).path != '/upload/youtube/v3/videos': return self._send(404)
+        if self.config.should_fail(): return self._send(503)
+        sid = uuid.uuid4().hex
+        with self.server.lock: self.server.sessions[sid] = 0
+        self._send(200, headers={'Location': f"http://127.0.0.1:{self.server.server_port}/upload/session/{sid}"})
+    def do_PUT(self):
+        sid = urlsplit(self.path).path.rsplit('/', 1)[-1]; length = int(self.headers.get('Content-Length', 0))
+        if self.config.latency: time.sleep(self.config.latency)
+        started, received = time.monotonic(), 0
+        while received < length: received += len(self.rfile.read(min(64 * 1024, length - received))); self._throttle(received, started)
+        with self.server.lock: confirmed = self.server.sessions.get(sid)
+        if confirmed is None: return self._send(404)
+        content_range = self.headers.get('Content-Range', '')
+        status_query = re.match(r'bytes \*/(\d+)', content_range)
+        if status_query: total = int(status_query.group(1))
+        else:
+            if self.config.should_fail(): return self._send(503)
+            first, last, total = map(int, re.match(r'bytes (\d+)-(\d+)/(\d+)', content_range).groups())
+            if first != confirmed: return self._send(308, headers={'Range': f'bytes=0-{confirmed - 1}'} if confirmed else {})
+            confirmed = last + 1
+            with self.server.lock: self.server.sessions[sid] = confirmed
+        if confirmed >= total: return self._json({'id': f"bench-{sid[:11]}", 'kind': 'youtube#video'})
+        self._send(308, headers={'Range': f'bytes=0-{confirmed - 1}'} if confirmed else {})
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+    def __init__(self, config):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.config, self.sessions, self.lock = config, {}, threading.Lock()
+    @property
+    def base_url(self): return f"http://127.0.0.1:{self.server_port}"
+    def start(self): threading.Thread(target=self.serve_forever, daemon=True).start(); return self
+    def stop(self): self.shutdown(); self.server_close()
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError): super().handle_error(request, client_address)  # clients hanging up mid-body are expected
+
+# A YouTube client whose requests (including resumable uploads) go to the stand-in server.
+def build_youtube_client(base_url):
+    import googleapiclient.discovery
+    from googleapiclient import discovery_cache
+    doc = json.loads(discovery_cache.get_static_doc('youtube', 'v3'))
+    doc['rootUrl'], doc['baseUrl'] = f"{base_url}/", f"{base_url}/youtube/v3/"
+    return googleapiclient.discovery.build_from_document(doc, developerKey='bench')
@@ -0,0 +1,153 @@
+import argparse
+import os
+import json
+import signal
+import sys
+import threading
+
+import engine
+
+# --- HEADLESS CLI ---
+# Runs the downloader, single upload and bulk upload flows without the Flet UI. Ctrl+C asks the run to
+# stop after the files in progress; a second Ctrl+C aborts immediately.
+def install_stop_handler():
+    stop = threading.Event()
+    def on_sigint(signum, frame):
+        if stop.is_set(): raise KeyboardInterrupt
+        stop.set(); print("Stop requested, finishing files in progress... (Ctrl+C again to abort)")
+    signal.signal(signal.SIGINT, on_sigint)
+    return stop
+
+def attach_event_stream(events, target):
+    if not target: return None
+    out = sys.stdout if target == '-' else open(target, 'a', encoding='utf-8')
+    lock = threading.Lock()
+    @events.subscribe
+    def write_event(event):
+        with lock: out.write(json.dumps(event, ensure_ascii=False, default=str) + "\n"); out.flush()
+    return out
+
+def connect_youtube(args):
+    youtube = engine.authenticate_youtube(args.credentials)
+    if not youtube: return None, None
+    if args.channel_id: return youtube, args.channel_id
+    channels = engine.list_youtube_channels(youtube)
+    if len(channels) == 1: print(f"✅ YouTube Channel Selected: {channels[0]['title']}"); return youtube, channels[0]['id']
+    print("❌ Error: Pick a channel with --channel-id:" if channels else "❌ Error: No YouTube channels found for this account.")
+    for c in channels: print(f"  {c['id']}  {c['title']}")
+    return None, None
+
+def cmd_channels(args, events, stop):
+    youtube = engine.authenticate_youtube(args.credentials)
+    if not youtube: return 1
+    for c in engine.list_youtube_channels(youtube): print(f"{c['id']}  {c['title']}")
+    return 0
+
+def cmd_plan(args, events, stop):
+    try: plan = engine.load_course_plan(args.course_json, args.output_dir); tasks = plan.tasks
+    except Exception as e: print(f"❌ Error processing JSON file: {e}"); return 2
+    print(f"{plan.course_title_raw}: {len(tasks)} files -> {plan.course_title}")
+    snapshot = engine.load_course_snapshot(plan.course_title)
+    if snapshot is None: print("No previous download snapshot; every file would be scheduled."); return 0
+    changes = plan.diff(snapshot)
+    pending = sum(1 for t in plan.tasks if t.id in snapshot and not snapshot[t.id]['complete'] and t not in changes['changed'])
+    print(f"Since the last download: {len(changes['added'])} new, {len(changes['changed'])} changed, {len(changes['moved'])} moved, {len(changes['removed'])} removed, {changes['unchanged']} unchanged ({pending} of them not downloaded yet).")
+    for label, tasks in (("+", changes['added']), ("~", changes['changed'])):
+        for t in tasks: print(f"  {label} {t.display_path}")
+    for t, old in changes['moved']: print(f"  > {old} -> {os.path.join(t.save_dir, t.filename)}")
+    for task_id in changes['removed']: print(f"  - {snapshot[task_id].get('path', task_id)}")
+    return 0
+
+def cmd_download(args, events, stop):
+    if not args.token: print("❌ Error: A bearer token is required (--token or EDOWNLOADER_TOKEN)."); return 2
+    youtube, cid, upload = None, None, None
+    if args.upload:
+        youtube, cid = connect_youtube(args)
+        if not youtube: return 2
+        upload = {'workers': args.upload_workers, 'privacy_status': args.privacy, 'chunk_size_mb': args.chunk_size, 'ceiling_gb': args.disk_ceiling, 'delete_after_upload': args.delete_after_upload}
+    failed = False
+    for json_path in args.course_json:
+        if stop.is_set(): break
+        summary = engine.run_download(json_path, args.token, args.output_dir, args.workers, args.bandwidth, not args.no_rpc, upload, youtube, cid, stop.is_set, events)
+        failed = failed or not summary or summary['failed'] > 0 or summary.get('upload', {}).get('failed', 0) > 0
+    return 1 if failed else 0
+
+def cmd_verify(args, events, stop):
+    download_options = {'workers': args.download_workers, 'use_rpc': not args.no_rpc}
+    failed = False
+    for json_path in args.course_json:
+        if stop.is_set(): break
+        summary = engine.run_verify(json_path, args.token, args.output_dir, args.workers, args.redownload, download_options, stop.is_set, events)
+        download = (summary or {}).get('download')
+        failed = failed or not summary or (summary['queued'] > 0 and (not download or download['failed'] > 0))
+    return 1 if failed else 0
+
+def cmd_upload(args, events, stop):
+    youtube, cid = connect_youtube(args)
+    if not youtube: return 2
+    return 0 if engine.run_single_upload(youtube, cid, args.video, args.title, args.description, args.privacy, args.chunk_size, events) else 1
+
+def cmd_bulk_upload(args, events, stop):
+    youtube, cid = connect_youtube(args)
+    if not youtube: return 2
+    summary = engine.run_bulk_upload(youtube, cid, args.folder, args.workers, args.privacy, args.chunk_size, stop.is_set, events)
+    return 0 if summary and not summary['failed'] else 1
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="edownloader", description="Headless course downloader and YouTube uploader.")
+    parser.add_argument("--events", metavar="FILE", help="Append progress events as JSON lines to FILE ('-' for stdout).")
+    parser.add_argument("--metrics", action="store_true", help="Time the hot paths and print a metrics summary after each run.")
+    parser.add_argument("--metrics-port", type=int, default=0, metavar="PORT", help="Serve Prometheus metrics on 127.0.0.1:PORT/metrics (implies --metrics).")
+    parser.add_argument("--metrics-file", metavar="FILE", help="Dump metrics as JSON to FILE periodically and on exit (implies --metrics).")
+    parser.add_argument("--metrics-interval", type=float, default=engine.METRICS_DUMP_INTERVAL, help="Seconds between metrics dumps.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    def youtube_options(p):
+        p.add_argument("--channel-id", help="Target channel (defaults to the account's only channel).")
+        p.add_argument("--credentials", default="youtube_token.json", help="Cached OAuth token, created on first login.")
+        p.add_argument("--privacy", default="private", choices=["private", "unlisted", "public"])
+        p.add_argument("--chunk-size", type=float, default=engine.UPLOAD_CHUNK_SIZE_MB, help="Upload chunk size in MB.")
+    p = sub.add_parser("channels", help="List the YouTube channels of the logged-in account.")
+    p.add_argument("--credentials", default="youtube_token.json"); p.set_defaults(func=cmd_channels)
+    p = sub.add_parser("plan", help="Show a course's files and what changed since its last download.")
+    p.add_argument("course_json"); p.add_argument("--output-dir"); p.set_defaults(func=cmd_plan)
+    p = sub.add_parser("download", help="Download one or more courses from their JSON files.")
+    p.add_argument("course_json", nargs="+")
+    p.add_argument("--token", default=os.environ.get("EDOWNLOADER_TOKEN"), help="Bearer token (or set EDOWNLOADER_TOKEN).")
+    p.add_argument("--output-dir", help="Output directory name (only sensible with a single course).")
+    p.add_argument("--workers", type=int, default=engine.DOWNLOAD_WORKERS)
+    p.add_argument("--bandwidth", type=float, default=engine.DOWNLOAD_MAX_BANDWIDTH_MBPS, help="Global cap in MB/s, 0 = unlimited.")
+    p.add_argument("--no-rpc", action="store_true", help="Start one aria2c process per file instead of the RPC daemon.")
+    p.add_argument("--upload", action="store_true", help="Upload each video to YouTube as soon as it finishes downloading.")
+    p.add_argument("--upload-workers", type=int, default=engine.UPLOAD_WORKERS)
+    p.add_argument("--disk-ceiling", type=float, default=engine.PIPELINE_DISK_CEILING_GB, help="GB of videos waiting for upload before downloads pause, 0 = unlimited.")
+    p.add_argument("--delete-after-upload", action="store_true")
+    youtube_options(p); p.set_defaults(func=cmd_download)
+    p = sub.add_parser("verify", help="Check downloaded courses for missing, truncated or corrupted files.")
+    p.add_argument("course_json", nargs="+")
+    p.add_argument("--token", default=os.environ.get("EDOWNLOADER_TOKEN"), help="Bearer token, used to read video sizes from the server (optional).")
+    p.add_argument("--output-dir", help="Output directory name used for the download.")
+    p.add_argument("--workers", type=int, default=engine.VERIFY_WORKERS, help="Hashing processes.")
+    p.add_argument("--redownload", action="store_true", help="Download the failed files again right away (needs a token).")
+    p.add_argument("--download-workers", type=int, default=engine.DOWNLOAD_WORKERS)
+    p.add_argument("--no-rpc", action="store_true", help="Start one aria2c process per file instead of the RPC daemon.")
+    p.set_defaults(func=cmd_verify)
+    p = sub.add_parser("upload", help="Upload a single video.")
+    p.add_argument("video"); p.add_argument("--title", required=True); p.add_argument("--description", default="")
+    youtube_options(p); p.set_defaults(func=cmd_upload)
+    p = sub.add_parser("bulk-upload", help="Upload every video under a folder, skipping titles already on the channel.")
+    p.add_argument("folder"); p.add_argument("--workers", type=int, default=engine.UPLOAD_WORKERS)
+    youtube_options(p); p.set_defaults(func=cmd_bulk_upload)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    events, stop = engine.EventBus(), install_stop_handler()
+    out = attach_event_stream(events, args.events)
+    if args.metrics or args.metrics_port or args.metrics_file: engine.metrics.configure(args.metrics_port, args.metrics_file, args.metrics_interval)
+    try: return args.func(args, events, stop)
+    finally:
+        engine.metrics.close()
+        if out and out is not sys.stdout: out.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
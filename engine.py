@@ -0,0 +1,1096 @@
+# --- IMPORTS ---
+import bisect
+import builtins
+import hashlib
+import itertools
+import json
+import os
+import queue
+import random
+import secrets
+import socket
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+import google_auth_oauthlib.flow
+import googleapiclient.discovery
+import googleapiclient.errors
+from googleapiclient.http import MediaFileUpload, build_http
+import google.oauth2.credentials
+import google.auth.transport.requests
+import google_auth_httplib2
+import httplib2
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- CONFIGURATION ---
+YOUTUBE_SCOPES = ["https://www.googleapis.com/auth/youtube", "https://www.googleapis.com/auth/youtube.upload", "https://www.googleapis.com/auth/youtube.readonly"]
+CLIENT_SECRETS_FILE = "client.json"
+BASE_PRESIGNED_URL = "https://api.empire.io.vn/api/v1/files/presigned/"
+BASE_DOC_URL = "https://api.empire.io.vn/api/v1/files/"
+EXPIRY_SECONDS = 14400
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_MAX_BANDWIDTH_MBPS = 0  # Shared by all workers, 0 = unlimited
+PRESIGNED_PREFETCH_AHEAD = 8  # Video URLs resolved ahead of the download cursor
+PRESIGNED_PREFETCH_WORKERS = 4
+PRESIGNED_MIN_REMAINING = 1800  # Floor for the lifetime a URL must have left when its download starts (seconds)
+PRESIGNED_LIFETIME_MARGIN = 1.5  # Estimated transfer time is stretched by this before comparing it with a URL's lifetime
+ARIA2_USE_RPC = True  # One long-lived aria2c daemon instead of a process per file
+ARIA2_POLL_INTERVAL = 0.5
+ARIA2_RPC_RETRIES = 3  # Consecutive failed status polls tolerated before a download is given up and removed
+ARIA2_OPTIONS = ['--console-log-level=warn','--summary-interval=0','--continue=true','-x16','-s16','-k1M']
+UPLOAD_WORKERS = 3
+UPLOAD_CHUNK_SIZE_MB = 16  # Rounded to a multiple of 256 KB as the resumable protocol requires
+UPLOAD_MAX_RETRIES = 8
+UPLOAD_RETRY_STATUSES = (500, 502, 503, 504)
+UPLOAD_SESSIONS_FILE = ".upload_sessions.json"
+UPLOAD_SESSION_TTL = 6 * 24 * 3600  # Resumable session URIs expire after about a week
+PIPELINE_QUEUE_SIZE = 4  # Finished videos waiting for an upload slot before downloads block
+PIPELINE_DISK_CEILING_GB = 20  # Downloaded-but-not-uploaded videos allowed on disk, 0 = unlimited
+CHANNEL_INDEX_DIR = ".channel_index"
+CHANNEL_INDEX_FULL_REFRESH = 7 * 24 * 3600  # Rebuild the cached title index from scratch after this many seconds
+DOWNLOAD_JOURNAL_FILE = ".download_journal.jsonl"
+LEGACY_DOWNLOAD_LOG_FILE = ".download_log.txt"
+COURSE_SNAPSHOT_FILE = ".course_snapshot.json"
+VERIFY_CACHE_FILE = ".verify_cache.json"
+VERIFY_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Hashing processes
+VERIFY_SIZE_WORKERS = 8  # Concurrent server size lookups
+VERIFY_BUFFER_SIZE = 8 * 1024 * 1024
+METRICS_ENABLED = os.environ.get('EDOWNLOADER_METRICS', '') not in ('', '0')  # Off: every timer/counter call is a no-op
+METRICS_PORT = 9464  # Prometheus text on http://127.0.0.1:<port>/metrics when enabled from the UI, 0 = off
+METRICS_DUMP_FILE = "edownloader_metrics.json"  # Periodic JSON dump when enabled from the UI, None = off
+METRICS_DUMP_INTERVAL = 10  # Seconds between JSON dumps
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)  # Latency histogram bounds (seconds)
+
+# --- CONSOLE OUTPUT ---
+# Download, upload and verify workers print from several threads at once. The builtin print writes the
+# text and the line end as separate calls, so lines from two threads could run together; this one hands
+# each line to the stream in a single write.
+def print(*values, sep=' ', end='\n', file=None, flush=False):
+    builtins.print(sep.join(map(str, values)) + end, end='', file=file, flush=flush)
+
+# --- METRICS ---
+# Counters and latency histograms for the hot paths: presigned URLs, aria2c, duplicate checks, upload
+# chunks and UI refreshes. While disabled, `timer()` hands back a shared no-op object and `inc()` returns
+# after one attribute check. Exported as Prometheus text (`serve`) and/or a periodic JSON dump (`dump_every`).
+class _NullTimer:
+    outcome = None
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+_NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'labels', 'outcome', 'started')
+    def __init__(self, metrics, name, labels): self.metrics, self.name, self.labels, self.outcome = metrics, name, labels, None
+    def __enter__(self): self.started = time.perf_counter(); return self
+    def __exit__(self, exc_type, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, outcome=self.outcome or ('error' if exc_type else 'ok'), **self.labels)
+        return False
+
+class Metrics:
+    def __init__(self, enabled=METRICS_ENABLED, buckets=METRICS_BUCKETS):
+        self.enabled, self.buckets, self.started_at = enabled, tuple(buckets), time.time()
+        self._counters, self._histograms, self._lock = {}, {}, threading.Lock()
+        self._server, self._dumper, self._stop = None, None, threading.Event()
+    # Set `.outcome` on the returned timer to override the default 'ok' / 'error' (raised) label.
+    def timer(self, name, **labels): return _Timer(self, name, labels) if self.enabled else _NULL_TIMER
+    def timed(self, name, fn, **labels):
+        def wrapper(*args, **kwargs):
+            with self.timer(name, **labels): return fn(*args, **kwargs)
+        return wrapper
+    def inc(self, name, value=1, **labels):
+        if not self.enabled: return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock: self._counters[key] = self._counters.get(key, 0) + value
+    def observe(self, name, seconds, **labels):
+        if not self.enabled: return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None: h = self._histograms[key] = {'buckets': [0] * (len(self.buckets) + 1), 'count': 0, 'sum': 0.0, 'max': 0.0}
+            h['buckets'][bisect.bisect_left(self.buckets, seconds)] += 1; h['count'] += 1; h['sum'] += seconds; h['max'] = max(h['max'], seconds)
+    def snapshot(self):
+        with self._lock:
+            return {'time': time.time(), 'started_at': self.started_at, 'bounds': list(self.buckets),
+                    'counters': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in sorted(self._counters.items())],
+                    'histograms': [{'name': n, 'labels': dict(l), **h, 'buckets': list(h['buckets'])} for (n, l), h in sorted(self._histograms.items())]}
+    def prometheus_text(self):
+        snap, lines, typed = self.snapshot(), [], set()
+        def fmt(labels, **extra): return '{' + ','.join(f'{k}="{v}"' for k, v in {**labels, **extra}.items()) + '}' if labels or extra else ''
+        for c in snap['counters']:
+            name = f"edownloader_{c['name']}_total"
+            if name not in typed: typed.add(name); lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{fmt(c['labels'])} {c['value']}")
+        for h in snap['histograms']:
+            name, cumulative = f"edownloader_{h['name']}_seconds", 0
+            if name not in typed: typed.add(name); lines.append(f"# TYPE {name} histogram")
+            for bound, n in zip([*snap['bounds'], '+Inf'], h['buckets']): cumulative += n; lines.append(f"{name}_bucket{fmt(h['labels'], le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{fmt(h['labels'])} {h['sum']:.6f}"); lines.append(f"{name}_count{fmt(h['labels'])} {h['count']}")
+        return "\n".join(lines) + "\n"
+    # Upper bound of the bucket holding the q-quantile observation (the max for the overflow bucket).
+    def _quantile(self, h, q):
+        rank, seen = q * h['count'], 0
+        for bound, n in zip(self.buckets, h['buckets']):
+            seen += n
+            if seen >= rank: return min(bound, h['max'])
+        return h['max']
+    def summary_lines(self):
+        snap, lines = self.snapshot(), []
+        def label(labels): return '{' + ','.join(f"{k}={v}" for k, v in labels.items()) + '}' if labels else ''
+        for h in snap['histograms']:
+            lines.append(f"{h['name']}{label(h['labels'])}: {h['count']} calls, avg {h['sum'] / h['count'] * 1000:.0f} ms, "
+                         f"p50 ≤ {self._quantile(h, 0.5) * 1000:.0f} ms, p99 ≤ {self._quantile(h, 0.99) * 1000:.0f} ms, max {h['max'] * 1000:.0f} ms")
+        for c in snap['counters']: lines.append(f"{c['name']}{label(c['labels'])}: {c['value']}")
+        return lines
+    def serve(self, port=METRICS_PORT):
+        if self._server: return self._server
+        metrics = self
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args): pass
+            def do_GET(self):
+                if self.path == '/metrics': body, ctype = metrics.prometheus_text().encode(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json': body, ctype = json.dumps(metrics.snapshot()).encode(), 'application/json'
+                else: self.send_response(404); self.end_headers(); return
+                self.send_response(200); self.send_header('Content-Type', ctype); self.send_header('Content-Length', str(len(body))); self.end_headers(); self.wfile.write(body)
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler); self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+    def dump(self, path):
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+    def dump_every(self, path, interval=METRICS_DUMP_INTERVAL):
+        if self._dumper: return
+        def loop():
+            while not self._stop.wait(interval):
+                try: self.dump(path)
+                except OSError as e: print(f"⚠️ Could not write metrics dump: {e}")
+            self.dump(path)
+        self._dumper = threading.Thread(target=loop, daemon=True); self._dumper.start()
+    def configure(self, port=0, dump_file=None, interval=METRICS_DUMP_INTERVAL):
+        self.enabled = True
+        if port:
+            try: self.serve(port); print(f"📈 Metrics at http://127.0.0.1:{self._server.server_port}/metrics")
+            except OSError as e: print(f"⚠️ Could not serve metrics on port {port}: {e}")
+        if dump_file: self.dump_every(dump_file, interval)
+        return self
+    def close(self):
+        self._stop.set()
+        if self._dumper: self._dumper.join(timeout=5); self._dumper = None
+        if self._server: self._server.shutdown(); self._server.server_close(); self._server = None
+
+metrics = Metrics()
+
+# --- HELPER FUNCTIONS ---
+# `credentials_file` lets unattended runs reuse (and refresh) a previously authorized token instead of
+# opening the browser consent flow every time.
+def authenticate_youtube(credentials_file=None):
+    os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
+    try:
+        credentials = None
+        if credentials_file and os.path.exists(credentials_file):
+            credentials = google.oauth2.credentials.Credentials.from_authorized_user_file(credentials_file, YOUTUBE_SCOPES)
+            if not credentials.valid and credentials.refresh_token: credentials.refresh(google.auth.transport.requests.Request())
+            if not credentials.valid: credentials = None
+        if not credentials:
+            if not os.path.exists(CLIENT_SECRETS_FILE): print(f"FATAL: {CLIENT_SECRETS_FILE} not found."); return None
+            flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(CLIENT_SECRETS_FILE, YOUTUBE_SCOPES)
+            credentials = flow.run_local_server(port=0)
+        if credentials_file:
+            # Holds the refresh token: owner-only, also tightening a file left behind by older versions
+            fd = os.open(credentials_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            if hasattr(os, 'fchmod'): os.fchmod(fd, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f: f.write(credentials.to_json())
+        return googleapiclient.discovery.build("youtube", "v3", credentials=credentials)
+    except Exception as e: print(f"❌ YouTube Auth Error: {e}"); return None
+
+def list_youtube_channels(youtube):
+    try:
+        req = youtube.channels().list(part="snippet,id", mine=True, maxResults=50)
+        return [{'id': c['id'], 'title': c['snippet']['title']} for c in req.execute().get('items', [])]
+    except Exception as e: print(f"❌ Error fetching YouTube channels: {e}"); return []
+
+# --- CHANNEL TITLE INDEX ---
+# Local copy of the channel's upload titles, built by paging the uploads playlist (1 quota unit per 50
+# videos instead of 100 per search). Cached per channel on disk; later runs only page until they reach a
+# video that is already known, since the uploads playlist lists newest first.
+class ChannelTitleIndex:
+    def __init__(self, youtube, channel_id, cache_dir=CHANNEL_INDEX_DIR):
+        self.youtube, self.channel_id, self.path = youtube, channel_id, os.path.join(cache_dir, f"{channel_id}.json")
+        self.videos, self.titles, self.refreshed_at, self._lock = {}, set(), 0, threading.Lock()
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f: cached = json.load(f)
+            if time.time() - cached.get('refreshed_at', 0) < CHANNEL_INDEX_FULL_REFRESH: self.videos, self.refreshed_at = cached.get('videos', {}), cached['refreshed_at']
+        except (OSError, ValueError): pass
+        self.refresh(); return self
+    def refresh(self):
+        incremental, added, page_token = bool(self.videos), 0, None
+        res = self.youtube.channels().list(part='contentDetails', id=self.channel_id).execute()
+        uploads = res['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+        while True:
+            res = self.youtube.playlistItems().list(part='snippet', playlistId=uploads, maxResults=50, pageToken=page_token).execute()
+            reached_known = False
+            for item in res.get('items', []):
+                video_id = item['snippet']['resourceId']['videoId']
+                if video_id in self.videos: reached_known = True
+                else: added += 1
+                self.videos[video_id] = item['snippet']['title']
+            page_token = res.get('nextPageToken')
+            if not page_token or (incremental and reached_known): break
+        self.titles = set(self.videos.values()); self.refreshed_at = self.refreshed_at if incremental else time.time()
+        self.save(); print(f"  Channel index: {len(self.videos)} videos ({added} new).")
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True); tmp = self.path + '.tmp'
+        with self._lock:
+            with open(tmp, 'w', encoding='utf-8') as f: json.dump({'refreshed_at': self.refreshed_at, 'videos': self.videos}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+    def add(self, video_id, title):
+        with self._lock: self.videos[video_id] = title; self.titles.add(title)
+        self.save()
+    def __contains__(self, title): return title in self.titles
+    # Incremental refreshes never see deletions, so before a batch of uploads starts, the videos behind
+    # every title it would skip are checked with videos.list, 50 ids per call (1 quota unit each), and
+    # the ones that no longer exist are evicted. A batch that errors is trusted as is.
+    def confirm(self, titles):
+        titles = set(titles)
+        with self._lock: ids = [video_id for video_id, t in self.videos.items() if t in titles]
+        stale = []
+        for i in range(0, len(ids), 50):
+            batch = ids[i:i + 50]
+            try: res = self.youtube.videos().list(part='id', id=','.join(batch)).execute()
+            except Exception as e: print(f"  ⚠️ Warning: Could not confirm {len(batch)} indexed video(s) on the channel, trusting the index: {e}"); continue
+            alive = {item['id'] for item in res.get('items', [])}
+            stale += [video_id for video_id in batch if video_id not in alive]
+        if stale:
+            with self._lock:
+                for video_id in stale: self.videos.pop(video_id, None)
+                self.titles = set(self.videos.values())
+            self.save(); print(f"  Channel index: dropped {len(stale)} deleted video(s).")
+        return len(stale)
+
+# `titles` are the ones about to be uploaded; their index hits are confirmed up front (see confirm).
+def load_channel_index(youtube, channel_id, titles=()):
+    try: index = ChannelTitleIndex(youtube, channel_id).load()
+    except Exception as e: print(f"  ⚠️ Warning: Could not build channel index, falling back to search: {e}"); return None
+    index.confirm(titles); return index
+
+# Called from parallel upload threads, so the search fallback runs on that thread's own connection.
+def check_video_exists(youtube, channel_id, title, index=None):
+    if index is not None:
+        with metrics.timer('check_video_exists', source='index'): return title in index
+    try:
+        with metrics.timer('check_video_exists', source='search'): search_response = youtube.search().list(q=f'"{title}"', part='snippet', channelId=channel_id, type='video', maxResults=5).execute(http=thread_http(youtube))
+        for item in search_response.get('items', []):
+            if item['snippet']['title'] == title: return True
+        return False
+    except Exception as e:
+        print(f"  ⚠️ Warning: Could not check for existing video due to API error: {e}"); return False
+
+# --- RESUMABLE UPLOADS ---
+# Session URIs are saved per channel + file (path, size, mtime) so an interrupted upload can pick up
+# from the server's last confirmed offset, even after an app restart.
+class UploadSessionStore:
+    def __init__(self, path=UPLOAD_SESSIONS_FILE):
+        self.path, self._lock = path, threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f: self.sessions = json.load(f)
+        except (OSError, ValueError): self.sessions = {}
+        self.sessions = {k: v for k, v in self.sessions.items() if time.time() - v.get('created_at', 0) < UPLOAD_SESSION_TTL}
+    @staticmethod
+    def key(cid, path):
+        st = os.stat(path); return f"{cid}|{os.path.abspath(path)}|{st.st_size}|{int(st.st_mtime)}"
+    def get(self, key): return self.sessions.get(key, {}).get('uri')
+    def put(self, key, uri):
+        with self._lock: self.sessions[key] = {'uri': uri, 'created_at': time.time()}; self._save()
+    def remove(self, key):
+        with self._lock:
+            if self.sessions.pop(key, None): self._save()
+    def _save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(self.sessions, f)
+        os.replace(tmp, self.path)
+
+# httplib2 connections are not thread-safe, so each upload thread sends its chunks over its own
+# authorized Http built from the client's credentials.
+_upload_http = threading.local()
+def thread_http(youtube):
+    cache = _upload_http.__dict__.setdefault('by_client', {})
+    if id(youtube) not in cache:
+        authorized = isinstance(youtube._http, google_auth_httplib2.AuthorizedHttp)
+        cache[id(youtube)] = google_auth_httplib2.AuthorizedHttp(youtube._http.credentials, http=build_http()) if authorized else build_http()
+    return cache[id(youtube)]
+
+def resumable_upload(youtube, cid, path, title, desc, privacy_status='private', chunk_size_mb=UPLOAD_CHUNK_SIZE_MB, sessions=None, on_progress=None):
+    chunk_size = max(1, round(chunk_size_mb * 4)) * 256 * 1024
+    body = {'snippet': {'title': title, 'description': desc, 'channelId': cid}, 'status': {'privacyStatus': privacy_status}}
+    req = youtube.videos().insert(part=",".join(body.keys()), body=body, media_body=MediaFileUpload(path, chunksize=chunk_size, resumable=True))
+    key = sessions.key(cid, path) if sessions else None
+    saved_uri = sessions.get(key) if sessions else None
+    if saved_uri: req.resumable_uri, req._in_error_state = saved_uri, True; print("  ↻ Resuming previous upload session...")
+    res, retries, http = None, 0, thread_http(youtube)
+    while res is None:
+        try:
+            with metrics.timer('upload_chunk'): status, res = req.next_chunk(http=http)
+            retries = 0
+            if sessions and req.resumable_uri and req.resumable_uri != saved_uri: saved_uri = req.resumable_uri; sessions.put(key, saved_uri)
+            if status and on_progress: on_progress(status.progress())
+            continue
+        except googleapiclient.errors.HttpError as e:
+            if e.resp.status in (404, 410) and saved_uri:
+                print("  ⚠️ Saved upload session expired, starting over.")
+                sessions.remove(key); req.resumable_uri, req._in_error_state, req.resumable_progress, saved_uri = None, False, 0, None; continue
+            if e.resp.status not in UPLOAD_RETRY_STATUSES: raise
+            error = e
+        except (OSError, httplib2.HttpLib2Error) as e: error = e
+        retries += 1; metrics.inc('upload_retries')
+        if retries > UPLOAD_MAX_RETRIES: raise error
+        delay = min(64, 2 ** retries) + random.random()
+        print(f"  ⚠️ Transient upload error ({error}), retrying from last confirmed offset in {delay:.1f}s...")
+        time.sleep(delay)
+    if sessions: sessions.remove(key)
+    return res.get('id')
+
+# --- BULK UPLOAD ENGINE ---
+# Uploads `jobs` ([(path, title, description), ...]) with up to `workers` running at once. One failed file
+# no longer stops the batch. Callbacks: on_start(job), on_progress(job, fraction), on_finish(job, state).
+def run_upload_jobs(youtube, cid, jobs, workers=UPLOAD_WORKERS, privacy_status='private', chunk_size_mb=UPLOAD_CHUNK_SIZE_MB, index=None, sessions=None, should_stop=lambda: False, on_start=None, on_progress=None, on_finish=None):
+    sessions, lock, pending = sessions or UploadSessionStore(), threading.Lock(), iter(enumerate(jobs))
+    summary = {'total': len(jobs), 'uploaded': 0, 'skipped': 0, 'failed': 0, 'failed_paths': [], 'stopped': False}
+    def finish(job, state):
+        metrics.inc('upload_jobs', state=state)
+        with lock:
+            summary[state] += 1
+            if state == 'failed': summary['failed_paths'].append(job[0])
+        if on_finish: on_finish(job, state)
+    def run_one(i, job):
+        path, title, desc = job
+        print(f"\n--- ({i+1}/{len(jobs)}) Processing: {path} ---")
+        if check_video_exists(youtube, cid, title, index): print(f"  ⏩ '{title}' already uploaded. Skipping video."); finish(job, 'skipped'); return
+        if on_start: on_start(job)
+        try:
+            def report(fraction):
+                print(f"  Uploading '{title}'... {int(fraction*100)}%")
+                if on_progress: on_progress(job, fraction)
+            video_id = resumable_upload(youtube, cid, path, title, desc, privacy_status, chunk_size_mb, sessions, report)
+        except Exception as e: print(f"  ❌ YouTube Upload Error for '{Path(path).name}': {e}"); finish(job, 'failed'); return
+        print(f"  ✅ Uploaded '{title}'. Video ID: {video_id}")
+        if index is not None and video_id: index.add(video_id, title)
+        finish(job, 'uploaded')
+    def worker_loop():
+        while True:
+            if should_stop():
+                with lock: summary['stopped'] = True
+                return
+            with lock: item = next(pending, None)
+            if item is None: return
+            try: run_one(*item)
+            except Exception as e: print(f"  ❌ Error processing '{item[1][0]}': {e}"); finish(item[1], 'failed')
+    threads = [threading.Thread(target=worker_loop, daemon=True) for _ in range(max(1, min(int(workers), len(jobs) or 1)))]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return summary
+
+def sanitize_filename(name):
+    s = "".join(c if c.isalnum() or c in (' ', '.', '_', '-', '[', ']') else '_' for c in name)
+    return ' '.join(s.split()).strip()[:150]
+
+# --- COURSE PLAN ---
+# A parsed course JSON, cached per (file, output dir) and reused while the file's mtime/size are unchanged
+# (or, if those moved, while its content hash still matches). Parsing is deferred until the title or
+# tasks are first needed. Each task carries a fingerprint of what is downloaded (file URL and type);
+# where it lands is its path. A plan is diffed against the snapshot saved by the previous download of
+# the course on both, so a renamed or renumbered lesson is a move, not a new download.
+class Task:
+    __slots__ = ('id', 'type', 'file_url_part', 'save_dir', 'filename', 'display_path', 'fingerprint')
+    def __init__(self, id, type, file_url_part, save_dir, filename, display_path, fingerprint):
+        self.id, self.type, self.file_url_part, self.save_dir, self.filename, self.display_path, self.fingerprint = id, type, file_url_part, save_dir, filename, display_path, fingerprint
+    def to_dict(self): return {k: getattr(self, k) for k in self.__slots__}
+
+class CoursePlan:
+    def __init__(self, json_file, output_dir=None, stat=None, digest=None):
+        self.json_file, self.output_dir, self.stat, self.digest = json_file, output_dir, stat, digest
+        self._title_raw, self._tasks = None, None
+    @property
+    def tasks(self):
+        if self._tasks is None: self._parse()
+        return self._tasks
+    @property
+    def course_title_raw(self):
+        if self._tasks is None: self._parse()
+        return self._title_raw
+    @property
+    def course_title(self): return sanitize_filename(self.output_dir or self.course_title_raw)
+    def _parse(self):
+        with open(self.json_file, 'r', encoding='utf-8') as f: course_data = json.load(f).get('course')
+        if not course_data: raise ValueError("Invalid JSON: 'course' key not found.")
+        course_title_raw = course_data.get('title', 'Unknown Course')
+        course_title_sanitized = sanitize_filename(self.output_dir or course_title_raw)
+        tasks = []
+        for i, chap in enumerate(course_data.get('chapters', [])):
+            chap_title = sanitize_filename(f"{i+1:02d} - {chap.get('title', 'Chap')}")
+            for j, less in enumerate(chap.get('lessons', [])):
+                less_info = less.get('lesson', {})
+                less_title_sanitized = sanitize_filename(f"{j+1:02d} - {less_info.get('title', 'Less')}")
+                less_title_raw = less_info.get('title', 'Less')
+                for res_item in sorted(less_info.get('resources', []), key=lambda x: x.get('order', 99)):
+                    res, file_url = res_item.get('resource', {}), res_item.get('resource', {}).get('fileUrl')
+                    if not file_url: continue
+                    ext, sub_dir = ('.mp4', "Videos") if res.get('type') == 'video' else ('.pdf', "TaiLieu") if res.get('type') == 'document' else (None, None)
+                    if not ext: continue
+                    original_title_from_json = res.get('title', 'file')
+                    original_title_stem = Path(original_title_from_json).stem
+                    new_filename_base = f"{original_title_stem} - [{less_title_raw}]"
+                    filename = sanitize_filename(new_filename_base) + ext
+                    save_directory = os.path.join(course_title_sanitized, chap_title, less_title_sanitized, sub_dir)
+                    display_path = os.path.join(chap_title, less_title_sanitized, sub_dir, filename)
+                    fingerprint = hashlib.sha1(json.dumps([file_url, res.get('type')]).encode('utf-8')).hexdigest()[:16]
+                    tasks.append(Task(file_url, res.get('type'), file_url, save_directory, filename, display_path, fingerprint))
+        self._title_raw, self._tasks = course_title_raw, tasks
+    # 'moved' holds (task, old path) pairs. Snapshot entries without a content fingerprint or path (older
+    # formats) count as unchanged on that part rather than forcing a re-download.
+    def diff(self, snapshot):
+        current, added, changed, moved = {t.id: t for t in self.tasks}, [], [], []
+        for t in self.tasks:
+            entry, path = snapshot.get(t.id), os.path.join(t.save_dir, t.filename)
+            if entry is None: added.append(t)
+            elif entry.get('content', t.fingerprint) != t.fingerprint: changed.append(t)
+            elif entry.get('path', path) != path: moved.append((t, entry['path']))
+        return {'added': added, 'changed': changed, 'moved': moved, 'removed': [task_id for task_id in snapshot if task_id not in current], 'unchanged': len(current) - len(added) - len(changed) - len(moved)}
+
+_course_plans, _course_plans_lock = {}, threading.Lock()
+def load_course_plan(json_file, output_dir=None):
+    key, st = (os.path.abspath(json_file), output_dir or ''), os.stat(json_file)
+    with _course_plans_lock: plan = _course_plans.get(key)
+    if plan and (plan.stat.st_mtime_ns, plan.stat.st_size) == (st.st_mtime_ns, st.st_size): return plan
+    with open(json_file, 'rb') as f: digest = hashlib.sha1(f.read()).hexdigest()
+    if plan and plan.digest == digest: plan.stat = st; return plan
+    plan = CoursePlan(json_file, output_dir, st, digest)
+    with _course_plans_lock: _course_plans[key] = plan
+    return plan
+
+def _get_course_structure(json_file, output_dir=None):
+    try:
+        plan = load_course_plan(json_file, output_dir)
+        return plan.course_title, plan.tasks, plan.course_title_raw
+    except Exception as e:
+        print(f"❌ Error processing JSON file: {e}"); return None, None, None
+
+# Every task planned by the last download of a course: {id: {content, complete, path}}. Entries whose
+# resource left the plan are kept (flagged 'removed') while their file is still on disk, so the removal
+# keeps being reported until the file is dealt with. Older snapshots mapped id -> fingerprint of complete
+# tasks, or kept a fingerprint that mixed content and location; those fingerprints are dropped on load.
+def load_course_snapshot(course_dir):
+    try:
+        with open(os.path.join(course_dir, COURSE_SNAPSHOT_FILE), 'r', encoding='utf-8') as f: snapshot = json.load(f)
+    except (OSError, ValueError): return None
+    return {k: {key: val for key, val in v.items() if key != 'fingerprint'} if isinstance(v, dict) else {'complete': True} for k, v in snapshot.items()}
+
+def save_course_snapshot(course_dir, tasks, journal, previous=None):
+    entries = {t.id: {'content': t.fingerprint, 'complete': journal.is_complete(t), 'path': os.path.join(t.save_dir, t.filename)} for t in tasks}
+    for task_id, entry in (previous or {}).items():
+        if task_id not in entries and entry.get('path') and os.path.exists(entry['path']): entries[task_id] = {**entry, 'complete': False, 'removed': True}
+    path = os.path.join(course_dir, COURSE_SNAPSHOT_FILE); tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f: json.dump(entries, f)
+    os.replace(tmp, path)
+
+# Moves the files (and aria2 control files) of tasks whose path changed since the snapshot and points
+# their journal entries at the new path. Everything is staged under a temporary name first, so tasks
+# that swap paths cannot overwrite each other. Lesson folders left empty are removed.
+def move_task_files(moves, journal):
+    staged = []
+    for t, old in moves:
+        new = os.path.join(t.save_dir, t.filename)
+        for suffix in ('', '.aria2'):
+            if os.path.exists(old + suffix): os.replace(old + suffix, old + suffix + '.moving'); staged.append((old + suffix + '.moving', new + suffix))
+    for src, dst in staged: os.makedirs(os.path.dirname(dst), exist_ok=True); os.replace(src, dst)
+    for t, old in moves:
+        rec = journal.entries.get(t.id)
+        if rec and rec.get('path'): journal.record(t.id, rec['state'], **{**{k: v for k, v in rec.items() if k not in ('id', 'state', 'ts')}, 'path': os.path.relpath(os.path.join(t.save_dir, t.filename), journal.course_dir)})
+        try: os.removedirs(os.path.dirname(old))
+        except OSError: pass
+
+def get_presigned_url(file_url, headers, session=None, expiry=EXPIRY_SECONDS):
+    try:
+        with metrics.timer('presigned_url'):
+            res = (session or requests).get(f"{BASE_PRESIGNED_URL}{file_url}?expirySeconds={int(expiry)}", headers=headers)
+            res.raise_for_status()
+        return res.json().get('url')
+    except Exception as e: print(f"❌ Presigned URL Error: {e}"); return None
+
+# --- PRESIGNED URL PREFETCH ---
+# Resolves presigned URLs in the background over one pooled session so the API round trip is off the
+# download critical path. URLs are cached with their expiry and only re-minted when they would not
+# live long enough for the file to finish: the lifetime a file needs is its size (or the largest file
+# seen so far) over the slower of the per-file bandwidth cap and the observed per-file throughput, with
+# `min_remaining` as the floor. Files that need longer than EXPIRY_SECONDS get a longer expiry.
+class PresignedURLCache:
+    def __init__(self, headers, workers=PRESIGNED_PREFETCH_WORKERS, min_remaining=PRESIGNED_MIN_REMAINING, bytes_per_second=0):
+        self.headers, self.min_remaining, self.bytes_per_second, self._observed, self._largest = headers, min_remaining, bytes_per_second, None, 0
+        self.session = requests.Session(); adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount('https://', adapter); self.session.mount('http://', adapter)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='presign')
+        self._urls, self._pending, self._lock = {}, {}, threading.Lock()
+    def observe(self, nbytes, seconds):
+        if nbytes <= 0 or seconds <= 0: return
+        with self._lock:
+            rate = nbytes / seconds
+            self._observed, self._largest = rate if self._observed is None else 0.7 * self._observed + 0.3 * rate, max(self._largest, nbytes)
+    def needed_lifetime(self, size=None):
+        rates, size = [r for r in (self.bytes_per_second, self._observed) if r], size or self._largest
+        return max(self.min_remaining, size / min(rates) * PRESIGNED_LIFETIME_MARGIN) if size and rates else self.min_remaining
+    def _mint(self, file_url, needed):
+        expiry = max(EXPIRY_SECONDS, int(needed) + 60)
+        minted_at = time.monotonic(); url = get_presigned_url(file_url, self.headers, self.session, expiry)
+        with self._lock:
+            if url: self._urls[file_url] = (url, minted_at + expiry)
+            self._pending.pop(file_url, None)
+        return url
+    def _fresh(self, file_url, needed):
+        entry = self._urls.get(file_url)
+        return entry[0] if entry and entry[1] - time.monotonic() >= needed else None
+    def prefetch(self, file_urls):
+        needed = self.needed_lifetime()
+        with self._lock:
+            for file_url in file_urls:
+                if file_url not in self._pending and not self._fresh(file_url, needed): self._pending[file_url] = self.pool.submit(self._mint, file_url, needed)
+    # `size` is the file's expected size in bytes when known (e.g. from an earlier attempt in the journal).
+    def get(self, file_url, size=None):
+        needed = self.needed_lifetime(size)
+        with self._lock: url, future = self._fresh(file_url, needed), self._pending.get(file_url)
+        if url: return url
+        if future:
+            future.result()
+            with self._lock: url = self._fresh(file_url, needed)
+            if url: return url
+        return self._mint(file_url, needed)
+    def close(self): self.pool.shutdown(wait=False, cancel_futures=True); self.session.close()
+
+def download_with_aria2(url, directory, filename, max_speed=0):
+    os.makedirs(directory, exist_ok=True)
+    cmd = ['aria2c',*ARIA2_OPTIONS,'--dir',directory,'--out',filename,url]
+    if max_speed: cmd.insert(-1, f'--max-download-limit={int(max_speed)}')
+    try:
+        with metrics.timer('aria2_download', mode='process') as timer:
+            p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8')
+            p.communicate(); timer.outcome = 'ok' if p.returncode == 0 else 'error'
+        return p.returncode == 0
+    except FileNotFoundError: print("❌ CRITICAL: 'aria2c' not found."); return False
+    except Exception as e: print(f"❌ aria2c Error: {e}"); return False
+
+# --- ARIA2 RPC DAEMON ---
+# A single `aria2c --enable-rpc` process shared by every download in a run. Keeps connections warm,
+# applies the bandwidth cap globally and reports byte-level progress while files are in flight.
+class Aria2RPCDaemon:
+    def __init__(self, max_concurrent=DOWNLOAD_WORKERS, max_speed=0):
+        self.max_concurrent, self.max_speed = max(1, int(max_concurrent)), int(max_speed)
+        self.secret, self.port, self.proc = secrets.token_hex(16), None, None
+        self.session, self._ids = requests.Session(), itertools.count(1)
+    def start(self, timeout=10):
+        with socket.socket() as s: s.bind(('127.0.0.1', 0)); self.port = s.getsockname()[1]
+        cmd = ['aria2c',*ARIA2_OPTIONS,'--enable-rpc','--rpc-listen-all=false',f'--rpc-listen-port={self.port}',f'--rpc-secret={self.secret}',
+               f'--max-concurrent-downloads={self.max_concurrent}',f'--max-overall-download-limit={self.max_speed}',f'--stop-with-process={os.getpid()}']
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None: raise RuntimeError(f"aria2c exited with code {self.proc.returncode}")
+            try: self.call('aria2.getVersion'); return self
+            except requests.exceptions.ConnectionError: time.sleep(0.1)
+        self.shutdown(); raise RuntimeError("aria2c RPC did not come up in time")
+    def call(self, method, *params):
+        payload = {'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': [f'token:{self.secret}', *params]}
+        body = self.session.post(f"http://127.0.0.1:{self.port}/jsonrpc", json=payload, timeout=10).json()
+        if 'error' in body: raise RuntimeError(body['error'].get('message', body['error']))
+        return body['result']
+    def add_uri(self, url, directory, filename):
+        os.makedirs(directory, exist_ok=True)
+        return self.call('aria2.addUri', [url], {'dir': os.path.abspath(directory), 'out': filename})
+    def tell_status(self, gid): return self.call('aria2.tellStatus', gid, ['status','totalLength','completedLength','downloadSpeed','errorMessage'])
+    def tell_active(self): return self.call('aria2.tellActive', ['gid','totalLength','completedLength','downloadSpeed'])
+    # A transient poll failure (timeout, JSON-RPC error) is retried; after ARIA2_RPC_RETRIES in a row the
+    # download is force-removed so aria2c does not keep writing a file the scheduler has marked failed.
+    def download(self, url, directory, filename, on_bytes=None):
+        try: gid = self.add_uri(url, directory, filename)
+        except Exception as e: print(f"❌ aria2c RPC Error: {e}"); return False
+        with metrics.timer('aria2_download', mode='rpc') as timer:
+            errors = 0
+            while True:
+                try: st = self.tell_status(gid); errors = 0
+                except Exception as e:
+                    errors += 1
+                    if errors > ARIA2_RPC_RETRIES: print(f"❌ aria2c RPC Error: {e}"); timer.outcome = 'error'; self.discard(gid); return False
+                    time.sleep(ARIA2_POLL_INTERVAL); continue
+                if on_bytes: on_bytes(int(st['completedLength']), int(st['totalLength']), int(st['downloadSpeed']))
+                if st['status'] in ('complete', 'error', 'removed'): break
+                time.sleep(ARIA2_POLL_INTERVAL)
+            timer.outcome = 'ok' if st['status'] == 'complete' else 'error'
+        try: self.call('aria2.removeDownloadResult', gid)
+        except Exception: pass
+        if st['status'] != 'complete': print(f"❌ aria2c Error: {st.get('errorMessage') or st['status']}")
+        return st['status'] == 'complete'
+    def discard(self, gid):
+        try: self.call('aria2.forceRemove', gid)
+        except Exception: pass
+        for _ in range(20):  # forceRemove is asynchronous; the result can only be removed once it has stopped
+            try: self.call('aria2.removeDownloadResult', gid); return
+            except Exception: time.sleep(0.1)
+    def shutdown(self):
+        if not self.proc: return
+        try: self.call('aria2.shutdown')
+        except Exception: pass
+        try: self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired: self.proc.kill()
+        self.proc = None; self.session.close()
+
+def start_aria2_daemon(max_concurrent, max_speed=0):
+    try:
+        with metrics.timer('aria2_startup'): return Aria2RPCDaemon(max_concurrent, max_speed).start()
+    except FileNotFoundError: print("❌ CRITICAL: 'aria2c' not found."); return None
+    except Exception as e: print(f"⚠️ Could not start aria2c RPC daemon, falling back to one process per file: {e}"); return None
+
+# --- DOWNLOAD JOURNAL ---
+# Append-only JSONL record of every task's state, one line per transition; the last line for an id wins.
+# Terminal states are fsynced so a crash loses at most the in-flight transitions, and a torn final line
+# is simply ignored on load. Completion is re-checked with a stat (size + no aria2 control file), never
+# by re-hashing, so startup stays cheap on large courses.
+def sha256_file(path, buffer_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(buffer_size): digest.update(chunk)
+    return digest.hexdigest()
+
+class DownloadJournal:
+    def __init__(self, course_dir):
+        os.makedirs(course_dir, exist_ok=True)
+        self.course_dir, self.path, self.entries, self._lock = course_dir, os.path.join(course_dir, DOWNLOAD_JOURNAL_FILE), {}, threading.Lock()
+        lines, damaged = self._load()
+        self._fh = open(self.path, 'a', encoding='utf-8')
+        if damaged or lines > 2 * len(self.entries) + 100: self.compact()
+    # Entries only, for display: creates nothing on disk, never compacts, and cannot record.
+    @classmethod
+    def read(cls, course_dir):
+        journal = cls.__new__(cls)
+        journal.course_dir, journal.path, journal.entries, journal._lock, journal._fh = course_dir, os.path.join(course_dir, DOWNLOAD_JOURNAL_FILE), {}, threading.Lock(), None
+        journal._load(); return journal
+    def _load(self):
+        if not os.path.exists(self.path): self._import_legacy_log(); return 0, bool(self.entries)
+        lines, damaged = 0, False
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                lines += 1
+                try: rec = json.loads(line); self.entries[rec['id']] = rec
+                except (ValueError, KeyError, TypeError): damaged = True
+                if not line.endswith('\n'): damaged = True
+        return lines, damaged
+    def _import_legacy_log(self):
+        legacy = os.path.join(self.course_dir, LEGACY_DOWNLOAD_LOG_FILE)
+        if not os.path.exists(legacy): return
+        with open(legacy, 'r', encoding='utf-8') as f:
+            for task_id in filter(None, (line.strip() for line in f)): self.entries[task_id] = {'id': task_id, 'state': 'done', 'source': 'manual', 'ts': time.time()}
+    def compact(self):
+        with self._lock:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for rec in self.entries.values(): f.write(json.dumps(rec, ensure_ascii=False) + '\n')
+                f.flush(); os.fsync(f.fileno())
+            self._fh.close(); os.replace(tmp, self.path); self._fh = open(self.path, 'a', encoding='utf-8')
+    def record(self, task_id, state, **fields):
+        rec = {'id': task_id, 'state': state, **fields, 'ts': time.time()}
+        with self._lock:
+            self.entries[task_id] = rec
+            self._fh.write(json.dumps(rec, ensure_ascii=False) + '\n'); self._fh.flush()
+            if state != 'downloading': os.fsync(self._fh.fileno())
+    def record_done(self, task, expected_size=None):
+        path, extra = os.path.join(task.save_dir, task.filename), {'expected_size': expected_size} if expected_size else {}
+        self.record(task.id, 'done', path=os.path.relpath(path, self.course_dir), size=os.path.getsize(path), sha256=sha256_file(path), completed_at=time.time(), **extra)
+    def record_uploaded(self, task, video_id, deleted):
+        fields = {k: v for k, v in self.entries.get(task.id, {}).items() if k not in ('id', 'state', 'ts')}
+        self.record(task.id, 'uploaded', **{**fields, 'video_id': video_id, 'deleted': deleted})
+    def is_complete(self, task):
+        rec = self.entries.get(task.id)
+        if not rec or rec['state'] not in ('done', 'uploaded'): return False
+        if rec.get('source') == 'manual' or rec.get('deleted'): return True
+        path = os.path.join(task.save_dir, task.filename)
+        try: return os.path.getsize(path) == rec.get('size') and not os.path.exists(path + '.aria2')
+        except OSError: return False
+    def close(self):
+        with self._lock:
+            if self._fh: self._fh.close()
+
+# --- INTEGRITY VERIFICATION ---
+# A file passes when it has no aria2 control file, its size matches aria2c's reported total (kept in the
+# journal) or the server's size, and its SHA-256 matches the one recorded when it finished. Hashing runs
+# in a process pool with large-buffer reads. Passing results are cached by path, size and mtime, so
+# re-verifying an unchanged tree costs one stat per file.
+class VerifyCache:
+    def __init__(self, course_dir):
+        self.path, self.entries = os.path.join(course_dir, VERIFY_CACHE_FILE), {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f: self.entries = json.load(f)
+        except (OSError, ValueError): pass
+    def get(self, rel_path, st):
+        entry = self.entries.get(rel_path)
+        return entry if entry and (entry['size'], entry['mtime_ns']) == (st.st_size, st.st_mtime_ns) else None
+    def put(self, rel_path, st, sha256): self.entries[rel_path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha256}
+    def remove(self, rel_path): self.entries.pop(rel_path, None)
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+# Size of the file behind `url` from a one-byte range request (presigned URLs are only signed for GET).
+def remote_file_size(url, session=None):
+    res = (session or requests).get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=30)
+    try:
+        res.raise_for_status(); total = res.headers.get('Content-Range', '').rpartition('/')[2]
+        if total.isdigit(): return int(total)
+        return int(res.headers['Content-Length']) if res.status_code == 200 and 'Content-Length' in res.headers else None
+    finally: res.close()
+
+# `headers` (the bearer token) is only needed to look up the server size of videos that have no aria2c
+# total in the journal. on_result(task, state, reason, finished, total) fires once per task with state
+# 'ok', 'failed' or 'skipped' (reason 'stopped' for files not reached before should_stop). Returns
+# {task_id: (state, reason)} covering every task.
+def verify_tasks(tasks, journal, headers=None, workers=VERIFY_WORKERS, should_stop=lambda: False, on_result=None):
+    cache, results, checked, lock = VerifyCache(journal.course_dir), {}, [], threading.Lock()
+    def finish(task, state, reason=None):
+        metrics.inc('verify_files', state=state)
+        with lock: results[task.id] = (state, reason); finished = len(results)
+        if on_result: on_result(task, state, reason, finished, len(tasks))
+    for t in tasks:
+        rec, path = journal.entries.get(t.id, {}), os.path.join(t.save_dir, t.filename)
+        if rec.get('deleted'): finish(t, 'skipped', 'uploaded and deleted'); continue
+        try: st = os.stat(path)
+        except OSError:
+            if rec.get('state') in ('done', 'uploaded') and rec.get('source') != 'manual': finish(t, 'failed', 'missing')
+            else: finish(t, 'skipped', 'queued for re-download' if str(rec.get('reason', '')).startswith('verify') else 'not downloaded')
+            continue
+        rel_path = os.path.relpath(path, journal.course_dir)
+        if os.path.exists(path + '.aria2'): cache.remove(rel_path); finish(t, 'failed', 'incomplete'); continue
+        if cache.get(rel_path, st): finish(t, 'ok', 'cached'); continue
+        checked.append((t, path, rel_path, st, rec))
+    session = requests.Session(); adapter = HTTPAdapter(pool_connections=1, pool_maxsize=VERIFY_SIZE_WORKERS)
+    session.mount('https://', adapter); session.mount('http://', adapter)
+    def expected_size(item):
+        t, _, _, _, rec = item
+        if rec.get('expected_size') or should_stop(): return rec.get('expected_size')
+        try:
+            url = f"{BASE_DOC_URL}{t.file_url_part}" if t.type != 'video' else get_presigned_url(t.file_url_part, headers, session) if headers else None
+            return remote_file_size(url, session) if url else None
+        except Exception as e: print(f"  ⚠️ Không lấy được kích thước trên server của '{t.filename}': {e}"); return None
+    with ThreadPoolExecutor(max_workers=VERIFY_SIZE_WORKERS) as pool: sizes = list(pool.map(expected_size, checked))
+    session.close()
+    to_hash = []
+    for item, size in zip(checked, sizes):
+        if size is not None and item[3].st_size != size: cache.remove(item[2]); finish(item[0], 'failed', f"size {item[3].st_size} != {size}")
+        else: to_hash.append(item)
+    if to_hash and not should_stop():
+        with ProcessPoolExecutor(max_workers=max(1, min(int(workers), len(to_hash)))) as pool:
+            futures = {pool.submit(sha256_file, item[1], VERIFY_BUFFER_SIZE): item for item in to_hash}
+            for future in as_completed(futures):
+                if should_stop():
+                    for f in futures: f.cancel()
+                    break
+                t, _, rel_path, st, rec = futures[future]
+                try: digest = future.result()
+                except Exception as e: cache.remove(rel_path); finish(t, 'failed', f"unreadable: {e}"); continue
+                if rec.get('sha256') and digest != rec['sha256']: cache.remove(rel_path); finish(t, 'failed', 'checksum mismatch'); continue
+                cache.put(rel_path, st, digest); finish(t, 'ok')
+    for t in tasks:
+        if t.id not in results: finish(t, 'skipped', 'stopped')
+    cache.save()
+    return results
+
+# --- DOWNLOAD SCHEDULER ---
+# Runs up to `workers` tasks at once. The bandwidth cap is split evenly between the workers so the
+# aggregate rate stays under it. `should_stop` is checked before each task starts; files already in
+# flight are allowed to finish. `on_progress(task, state, finished, total)` fires on every state change.
+# When an `rpc` daemon is given, tasks go through it (it enforces the cap itself) and
+# `on_transfer(active, completed_bytes, total_bytes, speed)` is fed from `tellActive` while the run lasts.
+# A `journal` gets a record for every task that starts, finishes or fails. A `pipeline` receives every
+# finished video and can hold back new downloads until it has disk room.
+def run_download_tasks(tasks, headers, workers=DOWNLOAD_WORKERS, max_bandwidth_mbps=DOWNLOAD_MAX_BANDWIDTH_MBPS, should_stop=lambda: False, on_progress=None, rpc=None, on_transfer=None, journal=None, pipeline=None):
+    workers = max(1, min(int(workers), len(tasks) or 1))
+    per_worker_speed = int(max_bandwidth_mbps * 1024 * 1024 / workers) if max_bandwidth_mbps else 0
+    run_finished, presigned = threading.Event(), PresignedURLCache(headers, bytes_per_second=per_worker_speed)
+    lock, pending = threading.Lock(), iter(enumerate(tasks))
+    summary = {'total': len(tasks), 'done': 0, 'failed': 0, 'stopped': False}
+    states = {t.id: 'queued' for t in tasks}
+    def report(task, state, expected_size=None):
+        if journal and state == 'done': journal.record_done(task, expected_size)
+        elif journal: journal.record(task.id, state)
+        if state in ('done', 'failed'): metrics.inc('download_tasks', state=state)
+        with lock:
+            states[task.id] = state
+            if state in ('done', 'failed'): summary[state] += 1
+            finished = summary['done'] + summary['failed']
+        if on_progress: on_progress(task, state, finished, len(tasks))
+    def run_one(i, task):
+        report(task, 'downloading')
+        print(f"Đang xử lý {i+1}/{len(tasks)}: {task.display_path}")
+        presigned.prefetch([t.file_url_part for t in tasks[i+1:i+1+PRESIGNED_PREFETCH_AHEAD] if t.type == 'video'])
+        previous = journal.entries.get(task.id, {}) if journal else {}
+        download_url = presigned.get(task.file_url_part, previous.get('expected_size') or previous.get('size')) if task.type == 'video' else f"{BASE_DOC_URL}{task.file_url_part}"
+        if not download_url: print(f"  Bỏ qua file '{task.filename}' do không lấy được URL."); report(task, 'failed'); return
+        totals, started = {}, time.monotonic()  # aria2c's reported total, kept in the journal for verify_tasks
+        ok = rpc.download(download_url, task.save_dir, task.filename, lambda done, total, speed: totals.update(total=total)) if rpc else download_with_aria2(download_url, task.save_dir, task.filename, per_worker_speed)
+        if not ok:
+            print(f"  Bỏ qua file '{task.filename}' do lỗi tải."); report(task, 'failed'); return
+        if task.type == 'video': presigned.observe(os.path.getsize(os.path.join(task.save_dir, task.filename)), time.monotonic() - started)
+        report(task, 'done', totals.get('total'))
+        if pipeline and task.type == 'video': pipeline.submit(task)
+    def worker_loop():
+        while True:
+            if pipeline: pipeline.wait_for_room(should_stop)
+            if should_stop():
+                with lock: summary['stopped'] = True
+                return
+            with lock: item = next(pending, None)
+            if item is None: return
+            try: run_one(*item)
+            except Exception as e: print(f"❌ Lỗi khi tải '{item[1].filename}': {e}"); report(item[1], 'failed')
+    def monitor_loop():
+        while not run_finished.wait(ARIA2_POLL_INTERVAL):
+            try: active = rpc.tell_active()
+            except Exception: continue
+            on_transfer(len(active), sum(int(a['completedLength']) for a in active), sum(int(a['totalLength']) for a in active), sum(int(a['downloadSpeed']) for a in active))
+    threads = [threading.Thread(target=worker_loop, daemon=True) for _ in range(workers)]
+    if rpc and on_transfer: threading.Thread(target=monitor_loop, daemon=True).start()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    run_finished.set(); presigned.close(); summary['states'] = states
+    return summary
+
+# --- DOWNLOAD -> UPLOAD PIPELINE ---
+# Uploads each finished video while later files are still downloading. Videos waiting for upload count
+# against a disk ceiling: the scheduler waits for room before starting another file (files already in
+# flight may overshoot it), and a full queue blocks the download worker that is handing a file over.
+# Once `should_stop()` is true (or close(abort=True) is called) nothing new is queued and queued videos
+# are dropped; uploads already in progress finish. Dropped videos stay 'done' in the journal, so the
+# next run with uploads picks them up again.
+class UploadPipeline:
+    def __init__(self, youtube, cid, course_title, workers=UPLOAD_WORKERS, privacy_status='private', chunk_size_mb=UPLOAD_CHUNK_SIZE_MB, index=None, journal=None, ceiling_gb=PIPELINE_DISK_CEILING_GB, delete_after_upload=False, should_stop=lambda: False):
+        self.youtube, self.cid, self.course_title, self.privacy_status, self.chunk_size_mb = youtube, cid, course_title, privacy_status, chunk_size_mb
+        self.index, self.journal, self.delete_after_upload, self.sessions = index, journal, delete_after_upload, UploadSessionStore()
+        self.queue, self.ceiling, self.pending_bytes, self._room = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE), int(ceiling_gb * 1024 ** 3), 0, threading.Condition()
+        self.summary, self._lock = {'uploaded': 0, 'skipped': 0, 'failed': 0, 'failed_paths': [], 'stopped': False}, threading.Lock()
+        self.should_stop, self._aborted, self._feeder = should_stop, False, None
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(max(1, int(workers)))]
+        for t in self.threads: t.start()
+    def wait_for_room(self, should_stop=lambda: False):
+        with self._room:
+            while self.ceiling and self.pending_bytes >= self.ceiling and not should_stop(): self._room.wait(0.5)
+    def stopping(self):
+        if self._aborted or self.should_stop(): self.summary['stopped'] = True; return True
+        return False
+    def _release(self, size):
+        with self._room: self.pending_bytes -= size; self._room.notify_all()
+    def submit(self, task):
+        if self.stopping(): return False
+        path = os.path.join(task.save_dir, task.filename); size = os.path.getsize(path)
+        with self._room: self.pending_bytes += size
+        while True:
+            try: self.queue.put((task, path, size), timeout=0.5); return True
+            except queue.Full:
+                if self.stopping(): self._release(size); return False
+    # Queues videos finished in an earlier run from a background thread; close() joins it first.
+    def feed(self, tasks):
+        def loop():
+            for task in tasks:
+                if not self.submit(task): return
+        self._feeder = threading.Thread(target=loop, daemon=True); self._feeder.start()
+    def _count(self, state, path=None):
+        with self._lock:
+            self.summary[state] += 1
+            if path: self.summary['failed_paths'].append(path)
+    def _worker(self):
+        while (item := self.queue.get()) is not None:
+            task, path, size = item
+            try:
+                if not self.stopping(): self._upload(task, path)
+            except Exception as e: print(f"  ❌ YouTube Upload Error for '{task.filename}': {e}"); self._count('failed', path)
+            finally: self._release(size)
+    def _upload(self, task, path):
+        title = Path(task.filename).stem
+        if check_video_exists(self.youtube, self.cid, title, self.index): print(f"  ⏩ '{title}' already uploaded. Skipping video."); self._count('skipped'); return
+        print(f"  ⬆️ Uploading '{title}' while downloads continue...")
+        video_id = resumable_upload(self.youtube, self.cid, path, title, f"{self.course_title}\n{task.display_path}", self.privacy_status, self.chunk_size_mb, self.sessions)
+        print(f"  ✅ Uploaded '{title}'. Video ID: {video_id}")
+        if self.index is not None and video_id: self.index.add(video_id, title)
+        if self.delete_after_upload: os.remove(path)
+        if self.journal: self.journal.record_uploaded(task, video_id, self.delete_after_upload)
+        self._count('uploaded')
+    def close(self, abort=False):
+        if abort: self._aborted = True
+        if self._feeder: self._feeder.join()
+        for _ in self.threads: self.queue.put(None)
+        for t in self.threads: t.join()
+        return self.summary
+
+# --- EVENTS ---
+# Engine runs report progress as plain dict events ({'type': ..., 'time': ..., ...}). Front ends (the Flet
+# UI, the CLI, scripts) subscribe callbacks; a failing subscriber never breaks the run.
+class EventBus:
+    def __init__(self): self._subscribers, self._lock = [], threading.Lock()
+    def subscribe(self, callback):
+        with self._lock: self._subscribers.append(callback)
+        return callback
+    def unsubscribe(self, callback):
+        with self._lock: self._subscribers.remove(callback)
+    def emit(self, kind, **data):
+        event = {'type': kind, 'time': time.time(), **data}
+        for callback in list(self._subscribers):
+            try: callback(event)
+            except Exception as e: print(f"⚠️ Event handler error for '{kind}': {e}")
+
+# --- RUNS ---
+# Entry points shared by the Flet UI and cli.py. Each takes a `should_stop` callable and an optional
+# EventBus and returns a summary dict (None when the run could not start).
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".avi", ".webm")
+
+def bearer_headers(token): return {'Authorization': f'Bearer {token}' if not token.lower().startswith('bearer ') else token}
+
+# End-of-run metrics summary: printed to the log and emitted as a `metrics.summary` event.
+def report_metrics(events):
+    if not metrics.enabled: return
+    print("--- Metrics (since start) ---")
+    for line in metrics.summary_lines(): print(f"  {line}")
+    events.emit('metrics.summary', metrics=metrics.snapshot())
+
+def find_videos(folder_path):
+    video_paths = []
+    for root, _, files in os.walk(folder_path):
+        for file in files:
+            if file.lower().endswith(VIDEO_EXTENSIONS): video_paths.append(os.path.join(root, file))
+    return video_paths
+
+# `upload` holds UploadPipeline options (workers, privacy_status, chunk_size_mb, ceiling_gb,
+# delete_after_upload) to upload videos as they finish; it needs `youtube` and `channel_id`.
+# `only_ids` limits the run to those task ids (run_verify uses it to fetch just the files it rejected).
+def run_download(json_path, token, output_dir=None, workers=DOWNLOAD_WORKERS, max_bandwidth_mbps=DOWNLOAD_MAX_BANDWIDTH_MBPS, use_rpc=ARIA2_USE_RPC, upload=None, youtube=None, channel_id=None, should_stop=lambda: False, events=None, only_ids=None):
+    events, rpc, journal, pipeline, summary, all_tasks, aborted = events or EventBus(), None, None, None, None, None, False
+    try:
+        if not token: print("[Lỗi] Bearer Token là bắt buộc."); return None
+        headers, (course_title, download_tasks, original_course_title) = bearer_headers(token), _get_course_structure(json_path, output_dir)
+        if not download_tasks: print("Could not find any tasks in the JSON."); return None
+        journal, snapshot = DownloadJournal(course_title), load_course_snapshot(course_title)
+        print(f"Bắt đầu tải khóa học: {original_course_title}")
+        print(f"Đã tìm thấy tổng cộng {len(download_tasks)} file để tải ({workers} luồng song song).")
+        if snapshot is not None:
+            changes = load_course_plan(json_path, output_dir).diff(snapshot)
+            print(f"So với lần tải trước: {len(changes['added'])} mới, {len(changes['changed'])} thay đổi, {len(changes['moved'])} đổi vị trí, {len(changes['removed'])} bị xoá.")
+            for t in changes['changed']:
+                if t.id not in journal.entries: continue
+                journal.record(t.id, 'pending', reason='changed')
+                old = snapshot[t.id].get('path') or os.path.join(t.save_dir, t.filename)
+                for stale in (old, old + '.aria2'):
+                    if os.path.exists(stale): os.remove(stale)
+            if changes['moved']: move_task_files(changes['moved'], journal)
+            events.emit('download.diff', added=[t.id for t in changes['added']], changed=[t.id for t in changes['changed']], moved=[t.id for t, _ in changes['moved']], removed=changes['removed'], unchanged=changes['unchanged'])
+        all_tasks, download_tasks = download_tasks, [t for t in download_tasks if not journal.is_complete(t)]
+        if len(download_tasks) < len(all_tasks): print(f"Bỏ qua {len(all_tasks) - len(download_tasks)} file đã tải xong trước đó.")
+        if only_ids is not None:
+            remaining = len(download_tasks); download_tasks = [t for t in download_tasks if t.id in only_ids]
+            print(f"Chỉ tải {len(download_tasks)}/{remaining} file còn lại theo yêu cầu.")
+        if upload:
+            if not all([youtube, channel_id]): print("❌ Error: Please authenticate and select a channel before uploading while downloading."); return None
+            index = load_channel_index(youtube, channel_id, (Path(t.filename).stem for t in all_tasks if t.type == 'video'))
+            pipeline = UploadPipeline(youtube, channel_id, original_course_title, index=index, journal=journal, should_stop=should_stop, **upload)
+            previous = [t for t in all_tasks if t.type == 'video' and journal.entries.get(t.id, {}).get('state') == 'done' and journal.is_complete(t) and journal.entries[t.id].get('source') != 'manual']
+            if previous: print(f"Đưa {len(previous)} video đã tải trước đó vào hàng đợi upload.")
+            pipeline.feed(previous)
+        events.emit('download.started', course=original_course_title, course_dir=course_title, total=len(download_tasks), skipped=len(all_tasks) - len(download_tasks))
+        if not download_tasks and not pipeline: print("\nTải khóa học hoàn tất!"); summary = {'total': 0, 'done': 0, 'failed': 0, 'stopped': False, 'states': {}}; return summary
+        if use_rpc: rpc = start_aria2_daemon(workers, max_bandwidth_mbps * 1024 * 1024)
+        def on_progress(task, state, finished, total): events.emit('download.task', task=task.to_dict(), state=state, finished=finished, total=total)
+        def on_transfer(active, completed_bytes, total_bytes, speed): events.emit('download.transfer', active=active, completed_bytes=completed_bytes, total_bytes=total_bytes, speed=speed)
+        summary = run_download_tasks(download_tasks, headers, workers, max_bandwidth_mbps, should_stop, on_progress, rpc, on_transfer, journal, pipeline)
+        if summary['stopped']: print("\n🛑 Quá trình tải đã được người dùng dừng lại.")
+        else: print("\nTải khóa học hoàn tất!")
+        print(f"Thành công: {summary['done']} | Lỗi: {summary['failed']} | Tổng: {summary['total']}")
+        if pipeline and not should_stop(): print("Đang chờ các video còn lại upload xong..."); events.emit('pipeline.draining')
+        return summary
+    except Exception as e: print(f"❌ Lỗi nghiêm trọng trong downloader: {e}"); aborted = True; return summary
+    finally:
+        if rpc: rpc.shutdown()
+        if pipeline:
+            upload_summary = pipeline.close(abort=aborted)
+            print(f"--- Upload pipeline {'stopped' if upload_summary['stopped'] else 'finished'}. Uploaded: {upload_summary['uploaded']} | Skipped: {upload_summary['skipped']} | Failed: {upload_summary['failed']} ---")
+            for path in upload_summary['failed_paths']: print(f"  ❌ Failed: {path}")
+            if summary is not None: summary['upload'] = upload_summary
+            events.emit('pipeline.finished', summary=upload_summary)
+        if journal:
+            if all_tasks: save_course_snapshot(course_title, all_tasks, journal, snapshot)
+            journal.close()
+        report_metrics(events)
+        events.emit('download.finished', summary=summary)
+
+# Checks a downloaded course with verify_tasks. Failed files are deleted and marked 'failed' in the
+# journal, so the next run_download fetches them again; `redownload` starts a run limited to the rejected
+# files right away, with `download_options` (run_download keyword arguments). Without a token, videos are checked against the
+# aria2c total and checksum recorded in the journal only.
+def run_verify(json_path, token=None, output_dir=None, workers=VERIFY_WORKERS, redownload=False, download_options=None, should_stop=lambda: False, events=None):
+    events, journal, summary = events or EventBus(), None, None
+    try:
+        course_title, tasks, original_course_title = _get_course_structure(json_path, output_dir)
+        if not tasks: print("Could not find any tasks in the JSON."); return None
+        if not os.path.isdir(course_title): print(f"❌ Không tìm thấy thư mục khóa học '{course_title}'."); return None
+        journal = DownloadJournal(course_title)
+        print(f"Đang kiểm tra {len(tasks)} file của khóa học: {original_course_title} ({workers} tiến trình)")
+        events.emit('verify.started', course=original_course_title, course_dir=course_title, total=len(tasks))
+        def on_result(task, state, reason, finished, total):
+            if state == 'failed': print(f"  ❌ {task.display_path}: {reason}")
+            events.emit('verify.file', task=task.to_dict(), state=state, reason=reason, finished=finished, total=total)
+        results = verify_tasks(tasks, journal, bearer_headers(token) if token else None, workers, should_stop, on_result)
+        failed = [t for t in tasks if results.get(t.id, ('',))[0] == 'failed']
+        for t in failed:
+            for stale in (os.path.join(t.save_dir, t.filename), os.path.join(t.save_dir, t.filename + '.aria2')):
+                if os.path.exists(stale): os.remove(stale)
+            journal.record(t.id, 'failed', reason=f"verify: {results[t.id][1]}")
+        states, queued_ids = [state for state, _ in results.values()], [t.id for t in tasks if results[t.id][0] == 'failed' or results[t.id][1] == 'queued for re-download']
+        summary = {'total': len(tasks), 'ok': states.count('ok'), 'failed': len(failed), 'skipped': states.count('skipped'), 'queued': len(queued_ids), 'failed_ids': [t.id for t in failed], 'queued_ids': queued_ids, 'stopped': should_stop()}
+        queued = summary['queued']
+        if summary['stopped']: print("\n🛑 Quá trình kiểm tra đã được người dùng dừng lại.")
+        print(f"Kiểm tra xong. Hợp lệ: {summary['ok']} | Lỗi: {summary['failed']} | Bỏ qua: {summary['skipped']} | Tổng: {summary['total']}")
+        if queued and not redownload: print(f"{queued} file lỗi đã được xoá và sẽ được tải lại ở lần tải tiếp theo.")
+    except Exception as e: print(f"❌ Lỗi nghiêm trọng khi kiểm tra: {e}")
+    finally:
+        if journal: journal.close()
+        report_metrics(events)
+        events.emit('verify.finished', summary=summary)
+    if redownload and summary and summary['queued'] and not should_stop():
+        print(f"Đang tải lại {summary['queued']} file lỗi...")
+        summary['download'] = run_download(json_path, token, output_dir, should_stop=should_stop, events=events, only_ids=set(summary['queued_ids']), **(download_options or {}))
+    return summary
+
+def run_single_upload(youtube, cid, path, title, desc, privacy_status='private', chunk_size_mb=UPLOAD_CHUNK_SIZE_MB, events=None):
+    events = events or EventBus(); events.emit('upload.started', path=path, title=title)
+    def on_progress(fraction): print(f"  Uploading... {int(fraction*100)}%"); events.emit('upload.progress', path=path, fraction=fraction)
+    try: video_id = resumable_upload(youtube, cid, path, title, desc, privacy_status, chunk_size_mb, UploadSessionStore(), on_progress)
+    except Exception as e: print(f"  ❌ YouTube Upload Error: {e}"); events.emit('upload.finished', path=path, state='failed', video_id=None); return None
+    print(f"  ✅ YouTube Upload successful! Video ID: {video_id}")
+    events.emit('upload.finished', path=path, state='uploaded', video_id=video_id); return video_id
+
+def run_bulk_upload(youtube, cid, folder_path, workers=UPLOAD_WORKERS, privacy_status='private', chunk_size_mb=UPLOAD_CHUNK_SIZE_MB, should_stop=lambda: False, events=None):
+    events = events or EventBus()
+    print(f"Scanning folder '{folder_path}' and all subfolders for videos...")
+    video_paths = find_videos(folder_path)
+    if not video_paths: print("No video files found in the selected directory or its subfolders."); return None
+    print(f"Found {len(video_paths)} videos. Loading channel index...")
+    index = load_channel_index(youtube, cid, (Path(p).stem for p in video_paths))
+    print(f"Starting bulk process with privacy set to '{privacy_status}' ({workers} parallel uploads)...")
+    events.emit('bulk.started', folder=folder_path, total=len(video_paths))
+    jobs = [(p, Path(p).stem, "Uploaded via Flet Bulk Uploader.") for p in video_paths]
+    summary = run_upload_jobs(youtube, cid, jobs, workers, privacy_status, chunk_size_mb, index, should_stop=should_stop,
+                              on_start=lambda job: events.emit('upload.started', path=job[0], title=job[1]),
+                              on_progress=lambda job, fraction: events.emit('upload.progress', path=job[0], fraction=fraction),
+                              on_finish=lambda job, state: events.emit('upload.finished', path=job[0], state=state))
+    print(f"\n--- Bulk upload process finished. Uploaded: {summary['uploaded']} | Skipped: {summary['skipped']} | Failed: {summary['failed']} ---")
+    for path in summary['failed_paths']: print(f"  ❌ Failed: {path}")
+    report_metrics(events)
+    events.emit('bulk.finished', summary=summary)
+    return summary
@@ -1,127 +1,74 @@
 import flet as ft
 import sys
 import io
-import os
 import threading
+import collections
+import logging
+import logging.handlers
+import time
 from pathlib import Path
 
-# --- TOOL 1: YOUTUBE UPLOADER IMPORTS (Unchanged) ---
-import google_auth_oauthlib.flow
-import googleapiclient.discovery
-import googleapiclient.errors
-from googleapiclient.http import MediaFileUpload
+# --- HEADLESS ENGINE (downloader, uploader and their configuration) ---
+from engine import (DOWNLOAD_WORKERS, DOWNLOAD_MAX_BANDWIDTH_MBPS, ARIA2_USE_RPC, UPLOAD_WORKERS, UPLOAD_CHUNK_SIZE_MB, PIPELINE_DISK_CEILING_GB,
+                    METRICS_PORT, METRICS_DUMP_FILE, EventBus, authenticate_youtube, list_youtube_channels, _get_course_structure, DownloadJournal, run_download,
+                    run_single_upload, run_bulk_upload, run_verify, metrics)
 
-# --- TOOL 2: COURSE DOWNLOADER IMPORTS (Unchanged) ---
-import json
-import requests
-import subprocess
+LOG_MAX_LINES = 5000  # Lines kept in the Log tab, oldest are evicted first
+LOG_FLUSH_FPS = 10
+LOG_FILE = "edownloader.log"
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+LOG_MANAGER_PAGE_SIZE = 200  # Checkboxes built per "Show more" click in the Manage Log dialog
 
-# --- GLOBAL CONFIGURATIONS (Unchanged) ---
-YOUTUBE_SCOPES = ["https://www.googleapis.com/auth/youtube", "https://www.googleapis.com/auth/youtube.upload", "https://www.googleapis.com/auth/youtube.readonly"]
-CLIENT_SECRETS_FILE = "client.json"
-BASE_PRESIGNED_URL = "https://api.empire.io.vn/api/v1/files/presigned/"
-BASE_DOC_URL = "https://api.empire.io.vn/api/v1/files/"
-EXPIRY_SECONDS = 14400
-
-# --- SHARED FLET LOGGER CLASS (Unchanged) ---
+# --- SHARED FLET LOGGER CLASS ---
+# write() only appends to a queue, so worker threads never wait on the UI. A background thread drains
+# the queue at LOG_FLUSH_FPS into a bounded ring of lines, re-renders the Log tab once per frame and
+# sends the full history to a rotating log file.
 class ConsoleLogger(io.TextIOBase):
-    def __init__(self, text_field: ft.TextField, page: ft.Page):
+    def __init__(self, text_field: ft.TextField, page: ft.Page, max_lines=LOG_MAX_LINES, fps=LOG_FLUSH_FPS, log_file=LOG_FILE):
         self.log_field, self.page, self.original_stdout = text_field, page, sys.stdout
+        self.lines, self._pending, self._interval, self._lock = collections.deque((text_field.value or "").splitlines(), maxlen=max_lines), collections.deque(), 1 / fps, threading.Lock()
+        self.file_log = logging.getLogger("edownloader.console"); self.file_log.setLevel(logging.INFO); self.file_log.propagate = False
+        if log_file and not self.file_log.handlers:
+            handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s")); self.file_log.addHandler(handler)
+        threading.Thread(target=self._flush_loop, daemon=True).start()
     def write(self, text: str):
-        if not text.strip(): return
-        self.log_field.value += text + "\n"
-        if self.page.navigation_rail.selected_index == 2:
-            self.page.update()
-        self.original_stdout.write(text)
+        if text.strip(): self._pending.append(text.rstrip('\n'))
+        return len(text)
+    def _flush_loop(self):
+        while True:
+            time.sleep(self._interval)
+            if not self._pending: continue
+            try:
+                with metrics.timer('log_flush'): self._flush_batch()
+            except Exception as e: self.original_stdout.write(f"Log flush error: {e}\n")
+    def _flush_batch(self):
+        batch = []
+        while self._pending: batch.append(self._pending.popleft())
+        text = "\n".join(batch)
+        self.original_stdout.write(text + "\n")
+        for line in text.splitlines(): self.file_log.info(line)
+        with self._lock: self.lines.extend(text.splitlines()); self._render()
+    def _render(self):
+        self.log_field.value = "\n".join(self.lines) + "\n"
+        rail = getattr(self.page, 'navigation_rail', None)
+        if rail and rail.selected_index == 2: self.page.update()
+    def clear(self, message="Log cleared."):
+        with self._lock: self.lines.clear(); self.lines.append(message); self._render()
     def flush(self): self.original_stdout.flush()
 
-# --- HELPER FUNCTIONS ---
-def authenticate_youtube():
-    os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
-    if not os.path.exists(CLIENT_SECRETS_FILE): print(f"FATAL: {CLIENT_SECRETS_FILE} not found."); return None
-    try:
-        flow = google_auth_oauthlib.flow.InstalledAppFlow.from_client_secrets_file(CLIENT_SECRETS_FILE, YOUTUBE_SCOPES)
-        credentials = flow.run_local_server(port=0)
-        return googleapiclient.discovery.build("youtube", "v3", credentials=credentials)
-    except Exception as e: print(f"❌ YouTube Auth Error: {e}"); return None
-
-def list_youtube_channels(youtube):
-    try:
-        req = youtube.channels().list(part="snippet,id", mine=True, maxResults=50)
-        return [{'id': c['id'], 'title': c['snippet']['title']} for c in req.execute().get('items', [])]
-    except Exception as e: print(f"❌ Error fetching YouTube channels: {e}"); return []
-
-def check_video_exists(youtube, channel_id, title):
-    try:
-        search_response = youtube.search().list(q=f'"{title}"', part='snippet', channelId=channel_id, type='video', maxResults=5).execute()
-        for item in search_response.get('items', []):
-            if item['snippet']['title'] == title: return True
-        return False
-    except Exception as e:
-        print(f"  ⚠️ Warning: Could not check for existing video due to API error: {e}"); return False
-
 # --- MODIFICATION: Added 'page' parameter ---
-def upload_video(page, youtube, cid, path, title, desc, ring, btn, privacy_status='private'):
+def upload_video(page, youtube, cid, path, title, desc, ring, btn, privacy_status='private', chunk_size_mb=UPLOAD_CHUNK_SIZE_MB):
+    events = EventBus()
+    @events.subscribe
+    def on_event(event):
+        if event['type'] == 'upload.progress': ring.value = event['fraction']; page.update()
     try:
         ring.visible = True; btn.disabled = True; page.update()
-        body = {'snippet': {'title': title, 'description': desc, 'channelId': cid}, 'status': {'privacyStatus': privacy_status}}
-        req = youtube.videos().insert(part=",".join(body.keys()), body=body, media_body=MediaFileUpload(path, chunksize=-1, resumable=True))
-        res = None
-        while res is None:
-            status, res = req.next_chunk()
-            if status: ring.value = status.progress(); print(f"  Uploading... {int(ring.value*100)}%"); page.update()
-        print(f"  ✅ YouTube Upload successful! Video ID: {res.get('id')}")
-        return True
-    except Exception as e: print(f"  ❌ YouTube Upload Error: {e}"); return False
+        return run_single_upload(youtube, cid, path, title, desc, privacy_status, chunk_size_mb, events)
     finally: ring.visible = False; btn.disabled = False; page.update()
 
-def sanitize_filename(name):
-    s = "".join(c if c.isalnum() or c in (' ', '.', '_', '-', '[', ']') else '_' for c in name)
-    return ' '.join(s.split()).strip()[:150]
-
-def _get_course_structure(json_file, output_dir=None):
-    try:
-        with open(json_file, 'r', encoding='utf-8') as f: course_data = json.load(f).get('course')
-        if not course_data: raise ValueError("Invalid JSON: 'course' key not found.")
-        course_title_raw = course_data.get('title', 'Unknown Course')
-        course_title_sanitized = sanitize_filename(output_dir or course_title_raw)
-        tasks = []
-        for i, chap in enumerate(course_data.get('chapters', [])):
-            chap_title = sanitize_filename(f"{i+1:02d} - {chap.get('title', 'Chap')}")
-            for j, less in enumerate(chap.get('lessons', [])):
-                less_info = less.get('lesson', {})
-                less_title_sanitized = sanitize_filename(f"{j+1:02d} - {less_info.get('title', 'Less')}")
-                less_title_raw = less_info.get('title', 'Less')
-                for res_item in sorted(less_info.get('resources', []), key=lambda x: x.get('order', 99)):
-                    res, file_url = res_item.get('resource', {}), res_item.get('resource', {}).get('fileUrl')
-                    if not file_url: continue
-                    ext, sub_dir = ('.mp4', "Videos") if res.get('type') == 'video' else ('.pdf', "TaiLieu") if res.get('type') == 'document' else (None, None)
-                    if not ext: continue
-                    original_title_from_json = res.get('title', 'file')
-                    original_title_stem = Path(original_title_from_json).stem
-                    new_filename_base = f"{original_title_stem} - [{less_title_raw}]"
-                    filename = sanitize_filename(new_filename_base) + ext
-                    save_directory = os.path.join(course_title_sanitized, chap_title, less_title_sanitized, sub_dir)
-                    display_path = os.path.join(chap_title, less_title_sanitized, sub_dir, filename)
-                    tasks.append({'id': file_url, 'type': res.get('type'), 'file_url_part': file_url, 'save_dir': save_directory, 'filename': filename, 'display_path': display_path})
-        return course_title_sanitized, tasks, course_title_raw
-    except Exception as e:
-        print(f"❌ Error processing JSON file: {e}"); return None, None, None
-
-def get_presigned_url(file_url, headers):
-    try:
-        res = requests.get(f"{BASE_PRESIGNED_URL}{file_url}?expirySeconds={EXPIRY_SECONDS}", headers=headers)
-        res.raise_for_status(); return res.json().get('url')
-    except Exception as e: print(f"❌ Presigned URL Error: {e}"); return None
-def download_with_aria2(url, directory, filename):
-    os.makedirs(directory, exist_ok=True)
-    cmd = ['aria2c','--console-log-level=warn','--summary-interval=0','-x16','-s16','-k1M','--dir',directory,'--out',filename,url]
-    try:
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding='utf-8')
-        p.communicate(); return p.returncode == 0
-    except FileNotFoundError: print("❌ CRITICAL: 'aria2c' not found."); return False
-    except Exception as e: print(f"❌ aria2c Error: {e}"); return False
-
 # --- MAIN FLET APPLICATION ---
 def main(page: ft.Page):
     page.title = "Multi-Tool App"
@@ -153,60 +100,63 @@ def main(page: ft.Page):
         upload_video(page, yt, cid, path, title, youtube_description_field.value, youtube_upload_progress_ring, youtube_upload_button, privacy_status=privacy)
 
     # --- MODIFICATION: Added 'page' parameter ---
-    def bulk_upload_worker(page, folder_path, start_button, privacy_status):
+    def bulk_upload_worker(page, folder_path, start_button, privacy_status, workers, chunk_size_mb):
         try:
             yt, cid = page.session.get("youtube_client"), page.session.get("selected_channel_id")
             if not all([yt, cid]): print("❌ Error: Please authenticate and select a channel first."); return
-            print(f"Scanning folder '{folder_path}' and all subfolders for videos...")
-            video_paths = []
-            valid_extensions = (".mp4", ".mov", ".mkv", ".avi", ".webm")
-            for root, _, files in os.walk(folder_path):
-                for file in files:
-                    if file.lower().endswith(valid_extensions): video_paths.append(os.path.join(root, file))
-            if not video_paths: print("No video files found in the selected directory or its subfolders."); return
-            total_videos = len(video_paths)
-            print(f"Found {total_videos} videos. Starting bulk process with privacy set to '{privacy_status}'...")
-            for i, video_path in enumerate(video_paths):
-                video_title = Path(video_path).stem
-                print(f"\n--- ({i+1}/{total_videos}) Processing: {video_path} ---")
-                print(f"  Checking for existing video with title: '{video_title}'...")
-                if check_video_exists(yt, cid, video_title):
-                    print(f"  ⏩ Already uploaded. Skipping video."); continue
-                print(f"  Video not found on channel. Starting upload...")
-                # --- MODIFICATION: Pass 'page' object to helper function ---
-                if not upload_video(page, yt, cid, video_path, video_title, f"Uploaded via Flet Bulk Uploader.", youtube_upload_progress_ring, youtube_upload_button, privacy_status=privacy_status):
-                    print(f"  ❌ Stopping bulk upload due to an error with '{Path(video_path).name}'."); break
-            print("\n--- Bulk upload process finished. ---")
+            events, rows = EventBus(), {}
+            @events.subscribe
+            def on_event(event):
+                if event['type'] == 'upload.started':
+                    rows[event['path']] = ft.Row([ft.ProgressBar(value=0,width=200), ft.Text(Path(event['path']).name)]); bulk_upload_progress_column.controls.append(rows[event['path']])
+                elif event['type'] == 'upload.progress': rows[event['path']].controls[0].value = event['fraction']
+                elif event['type'] == 'upload.finished' and event['path'] in rows: bulk_upload_progress_column.controls.remove(rows.pop(event['path']))
+                else: return
+                page.update()
+            run_bulk_upload(yt, cid, folder_path, workers, privacy_status, chunk_size_mb, events=events)
         except Exception as e: print(f"❌ A critical error occurred during bulk upload: {e}")
-        finally: start_button.disabled = False; page.update()
+        finally: bulk_upload_progress_column.controls.clear(); start_button.disabled = False; page.update()
 
-    def downloader_worker(json_path, token, output_dir, start_button, stop_button, progress_bar):
+    def downloader_worker(json_path, token, output_dir, workers, max_bandwidth_mbps, use_rpc, pipeline_options, start_button, stop_button, progress_bar):
         try:
-            if not token: print("[Lỗi] Bearer Token là bắt buộc."); return
-            headers, (course_title, download_tasks, original_course_title) = {'Authorization': f'Bearer {token}' if not token.lower().startswith('bearer ') else token}, _get_course_structure(json_path, output_dir)
-            if not download_tasks: print("Could not find any tasks in the JSON."); return
-            os.makedirs(course_title, exist_ok=True)
-            print(f"Bắt đầu tải khóa học: {original_course_title}")
-            print(f"Đã tìm thấy tổng cộng {len(download_tasks)} file để tải.")
-            progress_bar.visible = True; page.update()
-            for i, task in enumerate(download_tasks):
-                if page.session.get("downloader_should_stop"):
-                    print("\n🛑 Quá trình tải đã được người dùng dừng lại."); break
-                progress_bar.value = (i + 1) / len(download_tasks)
-                print(f"Đang xử lý {i+1}/{len(download_tasks)}: {task['display_path']}")
+            events, active, counts = EventBus(), set(), {'finished': 0, 'total': 0}
+            def render_status(transfer=""):
+                downloader_status_text.value = f"Hoàn thành {counts['finished']}/{counts['total']} | Đang tải {len(active)} file{transfer}"
                 page.update()
-                download_url = get_presigned_url(task['file_url_part'], headers) if task['type'] == 'video' else f"{BASE_DOC_URL}{task['file_url_part']}"
-                if download_url:
-                    if not download_with_aria2(download_url, task['save_dir'], task['filename']):
-                        print(f"  Bỏ qua file '{task['filename']}' do lỗi tải.")
-                else:
-                    print(f"  Bỏ qua file '{task['filename']}' do không lấy được URL.")
-            else: print("\nTải khóa học hoàn tất!")
+            @events.subscribe
+            def on_event(event):
+                if event['type'] == 'download.started':
+                    counts['total'] = event['total']; progress_bar.value = 0; progress_bar.visible = True; downloader_status_text.value = ""; downloader_status_text.visible = True; page.update()
+                elif event['type'] == 'download.task':
+                    if event['state'] == 'downloading': active.add(event['task']['id'])
+                    else: active.discard(event['task']['id'])
+                    counts['finished'] = event['finished']; progress_bar.value = event['finished'] / event['total']; render_status()
+                elif event['type'] == 'download.transfer':
+                    render_status(f" | {event['completed_bytes']/1048576:.1f}/{event['total_bytes']/1048576:.1f} MB | {event['speed']/1048576:.2f} MB/s")
+                elif event['type'] == 'pipeline.draining':
+                    downloader_status_text.value = "Đang upload các video còn lại..."; page.update()
+            run_download(json_path, token, output_dir, workers, max_bandwidth_mbps, use_rpc, pipeline_options, page.session.get("youtube_client"), page.session.get("selected_channel_id"),
+                         lambda: page.session.get("downloader_should_stop"), events)
         except Exception as e: print(f"❌ Lỗi nghiêm trọng trong downloader: {e}")
         finally:
             page.session.set("downloader_should_stop", False); start_button.visible = True; stop_button.visible = False
-            downloader_manage_log_button.disabled = False; start_button.disabled = False; progress_bar.visible = False
-            page.update()
+            downloader_manage_log_button.disabled = False; downloader_verify_button.disabled = False; start_button.disabled = False; progress_bar.visible = False; downloader_status_text.visible = False
+            stop_button.disabled = False; page.update()
+
+    def verify_worker(json_path, token, output_dir, progress_bar):
+        try:
+            events, counts = EventBus(), {'failed': 0}
+            @events.subscribe
+            def on_event(event):
+                if event['type'] == 'verify.started': progress_bar.value = 0; progress_bar.visible = True; downloader_status_text.visible = True; page.update()
+                elif event['type'] == 'verify.file':
+                    counts['failed'] += event['state'] == 'failed'; progress_bar.value = event['finished'] / event['total']
+                    downloader_status_text.value = f"Đã kiểm tra {event['finished']}/{event['total']} | Lỗi {counts['failed']}"; page.update()
+            run_verify(json_path, token or None, output_dir, events=events)
+        except Exception as e: print(f"❌ Lỗi nghiêm trọng khi kiểm tra: {e}")
+        finally:
+            downloader_start_button.disabled = False; downloader_manage_log_button.disabled = False; downloader_verify_button.disabled = False
+            progress_bar.visible = False; downloader_status_text.visible = False; page.update()
 
     # --- UI Event Handlers ---
     def start_youtube_auth_flow(e):
@@ -241,46 +191,62 @@ def main(page: ft.Page):
     def start_bulk_upload_flow(e):
         folder_path = page.session.get("bulk_upload_folder_path")
         if not folder_path: print("❌ Error: Please select a folder first."); return
+        try: workers, chunk_size_mb = max(1, int(bulk_workers_field.value or UPLOAD_WORKERS)), max(0.25, float(bulk_chunk_size_field.value or UPLOAD_CHUNK_SIZE_MB))
+        except ValueError: print("❌ Error: Parallel uploads and chunk size must be numbers."); return
         privacy = bulk_privacy_dropdown.value or 'private'; e.control.disabled = True; page.update()
         # --- MODIFICATION: Pass 'page' object to thread worker ---
-        threading.Thread(target=bulk_upload_worker, args=(page, folder_path, e.control, privacy), daemon=True).start()
+        threading.Thread(target=bulk_upload_worker, args=(page, folder_path, e.control, privacy, workers, chunk_size_mb), daemon=True).start()
 
     def start_downloader_flow(e):
         token, json_path = downloader_token_field.value, page.session.get("downloader_json_path")
         if not token or not json_path: print("❌ Error: Token and JSON file are required."); return
+        try:
+            workers, max_bandwidth = max(1, int(downloader_workers_field.value or DOWNLOAD_WORKERS)), max(0.0, float(downloader_bandwidth_field.value or 0))
+            pipeline_options = {'workers': max(1, int(bulk_workers_field.value or UPLOAD_WORKERS)), 'privacy_status': bulk_privacy_dropdown.value or 'private', 'chunk_size_mb': max(0.25, float(bulk_chunk_size_field.value or UPLOAD_CHUNK_SIZE_MB)),
+                                'ceiling_gb': max(0.0, float(downloader_disk_ceiling_field.value or 0)), 'delete_after_upload': bool(downloader_delete_after_upload_checkbox.value)} if downloader_pipeline_checkbox.value else None
+        except ValueError: print("❌ Error: Parallel downloads, bandwidth cap, disk ceiling and upload settings must be numbers."); return
         page.session.set("downloader_should_stop", False); e.control.visible = False; downloader_stop_button.visible = True
-        downloader_manage_log_button.disabled = True; page.update()
-        threading.Thread(target=downloader_worker, args=(json_path, token, downloader_output_dir_field.value, e.control, downloader_stop_button, downloader_progress_bar), daemon=True).start()
+        downloader_manage_log_button.disabled = True; downloader_verify_button.disabled = True; page.update()
+        threading.Thread(target=downloader_worker, args=(json_path, token, downloader_output_dir_field.value, workers, max_bandwidth, downloader_rpc_checkbox.value, pipeline_options, e.control, downloader_stop_button, downloader_progress_bar), daemon=True).start()
+    def start_verify_flow(e):
+        json_path = page.session.get("downloader_json_path")
+        if not json_path: print("❌ Select a JSON file first."); return
+        e.control.disabled = True; downloader_start_button.disabled = True; downloader_manage_log_button.disabled = True; page.update()
+        threading.Thread(target=verify_worker, args=(json_path, downloader_token_field.value, downloader_output_dir_field.value, downloader_progress_bar), daemon=True).start()
     def on_downloader_json_picked(e: ft.FilePickerResultEvent):
         if e.files: path = e.files[0].path; page.session.set("downloader_json_path", path); downloader_selected_json_text.value = f"Selected: {Path(path).name}"
         else: page.session.set("downloader_json_path", None); downloader_selected_json_text.value = "No file selected."
         page.update()
     def stop_downloader_flow(e):
-        print("Stop command received. The downloader will stop after the current file...")
+        print("Stop command received. The downloader will stop after the files in progress...")
         page.session.set("downloader_should_stop", True); e.control.disabled = True; page.update()
     def open_log_manager(e):
         json_path=page.session.get("downloader_json_path");
         if not json_path: print("❌ Select a JSON file first."); return
         def save_log(e_save):
-            course_title,_,_= _get_course_structure(json_path, downloader_output_dir_field.value)
-            log_file=os.path.join(course_title,".download_log.txt"); new_ids={cb.data for cb in log_manager_dialog.content.controls if cb.value}
-            with open(log_file,'w',encoding='utf-8') as f:
-                for item_id in sorted(list(new_ids)): f.write(f"{item_id}\n")
-            print(f"✅ Log file saved!"); log_manager_dialog.open = False; page.update()
+            course_title,_,_= _get_course_structure(json_path, downloader_output_dir_field.value); journal=DownloadJournal(course_title)
+            for cb in (c for c in log_manager_dialog.content.controls if isinstance(c,ft.Checkbox)):
+                done=journal.entries.get(cb.data,{}).get('state') in ('done','uploaded')
+                if cb.value and not done: journal.record(cb.data,'done',source='manual')
+                elif not cb.value and done: journal.record(cb.data,'pending',source='manual')
+            journal.close(); print(f"✅ Log file saved!"); log_manager_dialog.open = False; page.update()
         log_manager_dialog.content=ft.Row([ft.ProgressRing()]); log_manager_dialog.actions=[ft.ElevatedButton("Save",on_click=save_log),ft.TextButton("Cancel",on_click=lambda _:setattr(log_manager_dialog,'open',False) or page.update())]
         log_manager_dialog.open=True; page.update()
         def setup_worker(jp,o,d):
-            _,tasks,_=_get_course_structure(jp,o)
+            course_title,tasks,_=_get_course_structure(jp,o)
             if not tasks: d.content=ft.Text("No tasks found."); page.update(); return
-            log_f=os.path.join(sanitize_filename(o or _get_course_structure(jp)[2]),".download_log.txt"); ids=set()
-            if os.path.exists(log_f):
-                with open(log_f,'r',encoding='utf-8') as f: ids={line.strip() for line in f}
-            d.content=ft.ListView(expand=True,controls=[ft.Checkbox(label=t['display_path'],value=(t['id'] in ids),data=t['id']) for t in tasks])
-            page.update()
+            journal=DownloadJournal.read(course_title)
+            view,more=ft.ListView(expand=True),ft.TextButton()
+            def show_more(_=None):
+                if more in view.controls: view.controls.remove(more)
+                shown=len(view.controls); view.controls.extend(ft.Checkbox(label=t.display_path,value=journal.is_complete(t),data=t.id) for t in tasks[shown:shown+LOG_MANAGER_PAGE_SIZE])
+                if len(view.controls)<len(tasks): more.text=f"Show more ({len(tasks)-len(view.controls)} remaining)"; view.controls.append(more)
+                page.update()
+            more.on_click=show_more; d.content=view; show_more()
         threading.Thread(target=setup_worker,args=(json_path,downloader_output_dir_field.value,log_manager_dialog),daemon=True).start()
 
     def clear_log_output(e):
-        console_log_textfield.value = "Log cleared.\n"; page.update()
+        console_logger.clear(); page.update()
 
     # --- UI CONTROLS AND PAGE DEFINITIONS ---
     channel_dialog,log_manager_dialog = ft.AlertDialog(modal=True,title=ft.Text("Choose Channel")),ft.AlertDialog(modal=True,title=ft.Text("Manage Log"))
@@ -299,7 +265,10 @@ def main(page: ft.Page):
     
     bulk_upload_folder_text = ft.Text("No folder selected.")
     bulk_privacy_dropdown = ft.Dropdown(label="Privacy", value="private", width=200, options=[ft.dropdown.Option("private", "Private"), ft.dropdown.Option("unlisted", "Unlisted"), ft.dropdown.Option("public", "Public")])
+    bulk_workers_field = ft.TextField(label="Parallel Uploads",value=str(UPLOAD_WORKERS),width=150,keyboard_type=ft.KeyboardType.NUMBER)
+    bulk_chunk_size_field = ft.TextField(label="Chunk Size (MB)",value=str(UPLOAD_CHUNK_SIZE_MB),width=150,keyboard_type=ft.KeyboardType.NUMBER)
     bulk_upload_button = ft.ElevatedButton("Start Bulk Upload",on_click=start_bulk_upload_flow,icon=ft.icons.UPLOAD_FILE)
+    bulk_upload_progress_column = ft.Column(spacing=4)
 
     youtube_view = ft.Column([
         ft.Text("YouTube Uploader",size=24,weight=ft.FontWeight.BOLD), ft.Text("Step 1: Authenticate"), youtube_auth_stack, youtube_selected_channel_text,
@@ -307,18 +276,26 @@ def main(page: ft.Page):
         ft.Row([ft.ElevatedButton("Select Video",on_click=lambda _:youtube_file_picker.pick_files(allowed_extensions=["mp4","mov"])),youtube_selected_file_text]),
         ft.Row([youtube_upload_button,youtube_upload_progress_ring]), ft.Divider(), ft.Text("Step 3: Bulk Upload from Folder (Recursive)",size=20),
         ft.Row([ft.ElevatedButton("Select Folder",on_click=lambda _:directory_picker.get_directory_path(),icon=ft.icons.FOLDER_OPEN),bulk_upload_folder_text]),
-        ft.Row([bulk_privacy_dropdown, bulk_upload_button]),
+        ft.Row([bulk_privacy_dropdown, bulk_workers_field, bulk_chunk_size_field, bulk_upload_button]), bulk_upload_progress_column,
     ],spacing=12,scroll=ft.ScrollMode.AUTO)
     
     downloader_token_field = ft.TextField(label="Bearer Token",password=True,can_reveal_password=True)
     downloader_output_dir_field = ft.TextField(label="Output Directory Name (Optional)")
+    downloader_workers_field = ft.TextField(label="Parallel Downloads",value=str(DOWNLOAD_WORKERS),width=200,keyboard_type=ft.KeyboardType.NUMBER)
+    downloader_bandwidth_field = ft.TextField(label="Bandwidth Cap (MB/s, 0 = unlimited)",value=str(DOWNLOAD_MAX_BANDWIDTH_MBPS),width=300,keyboard_type=ft.KeyboardType.NUMBER)
+    downloader_rpc_checkbox = ft.Checkbox(label="Use persistent aria2c daemon (RPC)",value=ARIA2_USE_RPC)
+    downloader_pipeline_checkbox = ft.Checkbox(label="Upload videos to the selected YouTube channel as they finish (uses the bulk upload settings)",value=False)
+    downloader_disk_ceiling_field = ft.TextField(label="Disk Ceiling for Pending Uploads (GB, 0 = unlimited)",value=str(PIPELINE_DISK_CEILING_GB),width=400,keyboard_type=ft.KeyboardType.NUMBER)
+    downloader_delete_after_upload_checkbox = ft.Checkbox(label="Delete local video once its upload is confirmed",value=False)
     downloader_selected_json_text = ft.Text("No JSON file selected.")
     downloader_start_button = ft.ElevatedButton("Start Download",on_click=start_downloader_flow,icon=ft.icons.DOWNLOAD)
     downloader_stop_button = ft.ElevatedButton("Stop Download", on_click=stop_downloader_flow, icon=ft.icons.CANCEL, bgcolor=ft.colors.RED, visible=False)
     downloader_manage_log_button = ft.ElevatedButton("Manage Log",on_click=open_log_manager,icon=ft.icons.EDIT_DOCUMENT)
-    downloader_button_row = ft.Row([ft.Stack([downloader_start_button, downloader_stop_button]), downloader_manage_log_button])
+    downloader_verify_button = ft.ElevatedButton("Verify Files",on_click=start_verify_flow,icon=ft.icons.VERIFIED)
+    downloader_button_row = ft.Row([ft.Stack([downloader_start_button, downloader_stop_button]), downloader_manage_log_button, downloader_verify_button])
     downloader_progress_bar = ft.ProgressBar(visible=False,width=400)
-    downloader_view = ft.Column([ft.Text("Course Downloader",size=24,weight=ft.FontWeight.BOLD),ft.Text("Requires 'aria2c' to be installed."),downloader_token_field,ft.Row([ft.ElevatedButton("Select Course JSON",on_click=lambda _:downloader_file_picker.pick_files(allowed_extensions=["json"])),downloader_selected_json_text]),downloader_output_dir_field,downloader_button_row,downloader_progress_bar],spacing=12)
+    downloader_status_text = ft.Text("",visible=False)
+    downloader_view = ft.Column([ft.Text("Course Downloader",size=24,weight=ft.FontWeight.BOLD),ft.Text("Requires 'aria2c' to be installed."),downloader_token_field,ft.Row([ft.ElevatedButton("Select Course JSON",on_click=lambda _:downloader_file_picker.pick_files(allowed_extensions=["json"])),downloader_selected_json_text]),downloader_output_dir_field,ft.Row([downloader_workers_field,downloader_bandwidth_field]),downloader_rpc_checkbox,downloader_pipeline_checkbox,ft.Row([downloader_disk_ceiling_field,downloader_delete_after_upload_checkbox]),downloader_button_row,downloader_progress_bar,downloader_status_text],spacing=12)
     
     console_log_textfield = ft.TextField(multiline=True,read_only=True,expand=True,value="Welcome!\n",border_color="grey")
     clear_log_button = ft.ElevatedButton("Clear Log", on_click=clear_log_output, icon=ft.icons.CLEAR_ALL)
@@ -335,7 +312,9 @@ def main(page: ft.Page):
         
     navigation_rail = ft.NavigationRail(selected_index=0,label_type=ft.NavigationRailLabelType.ALL,on_change=nav_change,destinations=[ft.NavigationRailDestination(icon=ft.icons.UPLOAD_OUTLINED,selected_icon=ft.icons.UPLOAD,label="YouTube"),ft.NavigationRailDestination(icon=ft.icons.DOWNLOAD_OUTLINED,selected_icon=ft.icons.DOWNLOAD,label="Downloader"),ft.NavigationRailDestination(icon=ft.icons.TERMINAL_OUTLINED,selected_icon=ft.icons.TERMINAL,label="Log")])
     
-    sys.stdout=ConsoleLogger(console_log_textfield,page);sys.stderr=ConsoleLogger(console_log_textfield,page)
+    console_logger=ConsoleLogger(console_log_textfield,page);sys.stdout=sys.stderr=console_logger
+    # EDOWNLOADER_METRICS=1: time every page refresh and export the engine metrics while the app runs.
+    if metrics.enabled: metrics.configure(METRICS_PORT, METRICS_DUMP_FILE); page.update = metrics.timed('ui_refresh', page.update)
     
     page.navigation_rail = navigation_rail
     page.add(ft.Row([navigation_rail,ft.VerticalDivider(width=1),page_container],expand=True))
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# --- STAND-IN FOR `aria2c --enable-rpc` ---
+# Speaks the subset of aria2's JSON-RPC that engine.Aria2RPCDaemon uses and downloads over plain HTTP.
+#   FAKE_ARIA2_EXIT=<code>        exit right away (the daemon never comes up)
+#   FAKE_ARIA2_FAIL_STATUS=<n>    answer the first n tellStatus calls with a JSON-RPC error
+args = sys.argv[1:]
+if os.environ.get('FAKE_ARIA2_EXIT'): sys.exit(int(os.environ['FAKE_ARIA2_EXIT']))
+option = lambda name: next(a.split('=', 1)[1] for a in args if a.startswith(f'--{name}='))
+port, secret = int(option('rpc-listen-port')), option('rpc-secret')
+downloads, lock, gids, status_failures = {}, threading.Lock(), iter(range(1, 1 << 30)), [int(os.environ.get('FAKE_ARIA2_FAIL_STATUS', 0))]
+
+def fetch(d, url, path):
+    try:
+        with urllib.request.urlopen(url) as r, open(path, 'wb', buffering=0) as f:
+            d['totalLength'] = int(r.headers.get('Content-Length', 0))
+            while d['status'] == 'active' and (chunk := r.read(8 * 1024)): f.write(chunk); d['completedLength'] += len(chunk)
+        if d['status'] == 'active': d['status'] = 'complete'
+    except Exception as e: d['status'], d['errorMessage'] = 'error', str(e)
+
+def view(gid, d, keys=None): return {k: str(v) for k, v in {'gid': gid, **d}.items() if not keys or k in keys}
+
+def handle(method, params):
+    if method == 'aria2.getVersion': return {'version': 'fake'}
+    if method == 'aria2.addUri':
+        uris, opts = params; gid = f"{next(gids):016x}"
+        d = downloads[gid] = {'status': 'active', 'totalLength': 0, 'completedLength': 0, 'downloadSpeed': 0, 'errorMessage': ''}
+        os.makedirs(opts['dir'], exist_ok=True)
+        threading.Thread(target=fetch, args=(d, uris[0], os.path.join(opts['dir'], opts['out'])), daemon=True).start()
+        return gid
+    if method == 'aria2.tellStatus':
+        with lock:
+            if status_failures[0]: status_failures[0] -= 1; raise RuntimeError("injected tellStatus failure")
+        if params[0] not in downloads: raise RuntimeError(f"GID {params[0]} is not found")
+        return view(params[0], downloads[params[0]], params[1] if len(params) > 1 else None)
+    if method == 'aria2.tellActive': return [view(g, d, params[0] if params else None) for g, d in downloads.items() if d['status'] == 'active']
+    if method == 'aria2.forceRemove': downloads[params[0]]['status'] = 'removed'; return params[0]
+    if method == 'aria2.removeDownloadResult':
+        if downloads.get(params[0], {}).get('status') == 'active': raise RuntimeError("Could not remove download result of an active download")
+        downloads.pop(params[0], None); return 'OK'
+    if method == 'aria2.getGlobalStat': return {'numActive': str(sum(d['status'] == 'active' for d in downloads.values())), 'numStopped': str(sum(d['status'] != 'active' for d in downloads.values()))}
+    if method == 'aria2.shutdown': threading.Thread(target=server.shutdown).start(); return 'OK'
+    raise RuntimeError(f"Method not found: {method}")
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *a): pass
+    def do_POST(self):
+        req = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        token, *params = req['params']
+        try:
+            if token != f'token:{secret}': raise RuntimeError("Unauthorized")
+            body = {'jsonrpc': '2.0', 'id': req['id'], 'result': handle(req['method'], params)}
+        except Exception as e: body = {'jsonrpc': '2.0', 'id': req['id'], 'error': {'code': 1, 'message': str(e)}}
+        out = json.dumps(body).encode()
+        self.send_response(200); self.send_header('Content-Type', 'application/json'); self.send_header('Content-Length', str(len(out))); self.end_headers(); self.wfile.write(out)
+
+server = ThreadingHTTPServer(('127.0.0.1', port), Handler); server.daemon_threads = True
+server.serve_forever()
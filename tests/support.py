@@ -0,0 +1,15 @@
+import os
+import stat
+import sys
+import tempfile
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Directory holding an `aria2c` launcher for tests/fake_aria2c.py, to be put in front of PATH. The
+# launcher is a shell script, so tests that use it run on POSIX only.
+def fake_aria2c_dir():
+    bin_dir = tempfile.mkdtemp(prefix="fake-aria2c-")
+    launcher = os.path.join(bin_dir, 'aria2c')
+    with open(launcher, 'w') as f: f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(TESTS_DIR, "fake_aria2c.py")}" "$@"\n')
+    os.chmod(launcher, os.stat(launcher).st_mode | stat.S_IEXEC)
+    return bin_dir
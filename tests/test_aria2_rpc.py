@@ -0,0 +1,66 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [TESTS_DIR, os.path.dirname(TESTS_DIR), os.path.join(os.path.dirname(TESTS_DIR), 'bench')]
+
+import engine
+import stand_in
+import support
+
+# Aria2RPCDaemon against tests/fake_aria2c.py (a JSON-RPC stand-in put on PATH as `aria2c`) and the
+# bench file server. The launcher is a shell script, so these run on POSIX only.
+@unittest.skipIf(os.name == 'nt', "fake aria2c launcher is a shell script")
+class Aria2RPCDaemonTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = stand_in.StandInServer(stand_in.StandInConfig(video_size=300 * 1024)).start()
+        cls.slow_server = stand_in.StandInServer(stand_in.StandInConfig(bandwidth=100 * 1024, video_size=300 * 1024)).start()
+        cls.bin_dir = support.fake_aria2c_dir()
+    @classmethod
+    def tearDownClass(cls): cls.server.stop(); cls.slow_server.stop(); shutil.rmtree(cls.bin_dir, ignore_errors=True)
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp(prefix="aria2-out-")
+        patcher = mock.patch.dict(os.environ, {'PATH': self.bin_dir + os.pathsep + os.environ.get('PATH', '')})
+        patcher.start(); self.addCleanup(patcher.stop); self.addCleanup(shutil.rmtree, self.out_dir, True)
+        poll = mock.patch.object(engine, 'ARIA2_POLL_INTERVAL', 0.05); poll.start(); self.addCleanup(poll.stop)
+    def start_daemon(self):
+        daemon = engine.start_aria2_daemon(2)
+        self.assertIsNotNone(daemon); self.addCleanup(daemon.shutdown)
+        return daemon
+
+    def test_download_reports_progress_and_completes(self):
+        daemon, seen = self.start_daemon(), []
+        ok = daemon.download(f"{self.server.base_url}/blob/video-1", self.out_dir, "a.mp4", lambda done, total, speed: seen.append(total))
+        self.assertTrue(ok)
+        self.assertEqual(os.path.getsize(os.path.join(self.out_dir, "a.mp4")), 300 * 1024)
+        self.assertEqual(seen[-1], 300 * 1024)
+        self.assertEqual(daemon.tell_active(), [])
+
+    def test_transient_status_errors_are_retried(self):
+        with mock.patch.dict(os.environ, {'FAKE_ARIA2_FAIL_STATUS': str(engine.ARIA2_RPC_RETRIES)}): daemon = self.start_daemon()
+        self.assertTrue(daemon.download(f"{self.server.base_url}/blob/video-2", self.out_dir, "b.mp4"))
+
+    def test_persistent_status_errors_remove_the_download(self):
+        with mock.patch.dict(os.environ, {'FAKE_ARIA2_FAIL_STATUS': '1000'}): daemon = self.start_daemon()
+        self.assertFalse(daemon.download(f"{self.slow_server.base_url}/blob/video-3", self.out_dir, "c.mp4"))
+        self.assertEqual(daemon.call('aria2.getGlobalStat'), {'numActive': '0', 'numStopped': '0'})
+        time.sleep(1); size = os.path.getsize(os.path.join(self.out_dir, "c.mp4")); time.sleep(0.5)
+        self.assertLess(size, 300 * 1024); self.assertEqual(os.path.getsize(os.path.join(self.out_dir, "c.mp4")), size)
+
+    def test_shutdown_stops_the_process(self):
+        daemon = self.start_daemon(); proc = daemon.proc
+        daemon.shutdown()
+        self.assertIsNone(daemon.proc); self.assertIsNotNone(proc.poll())
+
+    def test_falls_back_when_the_daemon_cannot_start(self):
+        with mock.patch.dict(os.environ, {'FAKE_ARIA2_EXIT': '3'}): self.assertIsNone(engine.start_aria2_daemon(2))
+        with mock.patch.dict(os.environ, {'PATH': self.out_dir}): self.assertIsNone(engine.start_aria2_daemon(2))
+
+if __name__ == '__main__':
+    unittest.main()
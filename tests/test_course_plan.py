@@ -0,0 +1,148 @@
+import contextlib
+import glob
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [TESTS_DIR, os.path.dirname(TESTS_DIR), os.path.join(os.path.dirname(TESTS_DIR), 'bench')]
+
+import engine
+import fixtures
+import stand_in
+import support
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f: json.dump(data, f)
+
+# What run_download does with the diff between a course and its snapshot, against the bench file server
+# and tests/fake_aria2c.py. The launcher is a shell script, so these run on POSIX only.
+class CourseChangesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = stand_in.StandInServer(stand_in.StandInConfig(video_size=64 * 1024, doc_size=8 * 1024)).start()
+        cls.bin_dir = support.fake_aria2c_dir()
+    @classmethod
+    def tearDownClass(cls): cls.server.stop(); shutil.rmtree(cls.bin_dir, ignore_errors=True)
+    def setUp(self):
+        self.work_dir, cwd = tempfile.mkdtemp(prefix="course-"), os.getcwd()
+        os.chdir(self.work_dir); self.addCleanup(os.chdir, cwd); self.addCleanup(shutil.rmtree, self.work_dir, True)
+        for patcher in (mock.patch.dict(os.environ, {'PATH': self.bin_dir + os.pathsep + os.environ.get('PATH', '')}),
+                        mock.patch.object(engine, 'BASE_PRESIGNED_URL', f"{self.server.base_url}/api/v1/files/presigned/"),
+                        mock.patch.object(engine, 'BASE_DOC_URL', f"{self.server.base_url}/api/v1/files/"),
+                        mock.patch.object(engine, 'ARIA2_POLL_INTERVAL', 0.05)):
+            patcher.start(); self.addCleanup(patcher.stop)
+        self.json_path, self.course = os.path.join(self.work_dir, "course.json"), fixtures.make_course(6, lessons_per_chapter=3, title="Plan Course")
+        write_json(self.json_path, self.course)
+    def download(self):
+        bus, started = engine.EventBus(), []
+        bus.subscribe(lambda e: started.append(e['task']['id']) if e['type'] == 'download.task' and e['state'] == 'downloading' else None)
+        with contextlib.redirect_stdout(io.StringIO()): summary = engine.run_download(self.json_path, "token", workers=2, events=bus)
+        self.assertEqual(summary['failed'], 0)
+        return started
+    def files_on_disk(self): return sorted(glob.glob(os.path.join("Plan Course", "**", "*.*"), recursive=True))
+
+    @unittest.skipIf(os.name == 'nt', "fake aria2c launcher is a shell script")
+    def test_reordered_lessons_are_moved_not_downloaded_again(self):
+        self.assertEqual(len(self.download()), 6)
+        lessons = self.course['course']['chapters'][0]['lessons']; lessons.insert(0, lessons.pop())
+        write_json(self.json_path, self.course)
+        changes = engine.load_course_plan(self.json_path).diff(engine.load_course_snapshot("Plan Course"))
+        self.assertEqual((len(changes['added']), len(changes['changed']), len(changes['moved'])), (0, 0, 6))
+        self.assertEqual(self.download(), [])
+        files = self.files_on_disk()
+        self.assertEqual(files, sorted(os.path.join(t.save_dir, t.filename) for t in engine.load_course_plan(self.json_path).tasks))
+        journal = engine.DownloadJournal("Plan Course"); self.addCleanup(journal.close)
+        self.assertTrue(all(journal.is_complete(t) for t in engine.load_course_plan(self.json_path).tasks))
+
+    @unittest.skipIf(os.name == 'nt', "fake aria2c launcher is a shell script")
+    def test_metadata_change_keeps_the_file(self):
+        self.download()
+        self.course['course']['chapters'][0]['lessons'][0]['lesson']['resources'][0]['resource']['viewCount'] = 7
+        write_json(self.json_path, self.course)
+        self.assertEqual(self.download(), [])
+        self.assertEqual(len(self.files_on_disk()), 6)
+
+# CoursePlan.diff, the snapshot file and the parsed-plan cache; no network or aria2c involved.
+class CoursePlanTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir, cwd = tempfile.mkdtemp(prefix="plan-"), os.getcwd()
+        os.chdir(self.work_dir); self.addCleanup(os.chdir, cwd); self.addCleanup(shutil.rmtree, self.work_dir, True)
+        self.json_path, self.course = os.path.join(self.work_dir, "course.json"), fixtures.make_course(6, lessons_per_chapter=3, title="Plan Course")
+        write_json(self.json_path, self.course)
+        self.journal = engine.DownloadJournal("Plan Course"); self.addCleanup(self.journal.close)
+    def resources(self, lesson): return self.course['course']['chapters'][0]['lessons'][lesson]['lesson']['resources']
+    def snapshot_plan(self):
+        plan = engine.load_course_plan(self.json_path)
+        for t in plan.tasks:
+            os.makedirs(t.save_dir, exist_ok=True)
+            with open(os.path.join(t.save_dir, t.filename), 'wb') as f: f.write(b"data")
+            self.journal.record_done(t)
+        engine.save_course_snapshot("Plan Course", plan.tasks, self.journal)
+        return engine.load_course_snapshot("Plan Course")
+
+    def test_diff_separates_new_changed_moved_and_removed(self):
+        snapshot = self.snapshot_plan()
+        self.resources(0).append({'resource': {'type': 'document', 'title': "extra.pdf", 'fileUrl': "document-extra"}, 'order': 5})
+        self.resources(1)[0]['resource']['type'] = 'document'
+        self.course['course']['chapters'][0]['lessons'][2]['lesson']['title'] = "Renamed"
+        self.resources(0).pop(0)
+        write_json(self.json_path, self.course)
+        changes = engine.load_course_plan(self.json_path).diff(snapshot)
+        self.assertEqual([t.id for t in changes['added']], ["document-extra"])
+        self.assertEqual([t.id for t in changes['changed']], ["video-00002"])
+        self.assertEqual(sorted(t.id for t, _ in changes['moved']), ["document-00005", "video-00004"])
+        self.assertEqual(changes['removed'], ["video-00000"])
+        self.assertEqual(changes['unchanged'], 2)
+
+    def test_snapshot_records_every_planned_task(self):
+        plan = engine.load_course_plan(self.json_path)
+        engine.save_course_snapshot("Plan Course", plan.tasks, self.journal)
+        snapshot = engine.load_course_snapshot("Plan Course")
+        self.assertEqual(sorted(snapshot), sorted(t.id for t in plan.tasks))
+        self.assertFalse(any(entry['complete'] for entry in snapshot.values()))
+        self.assertEqual(plan.diff(snapshot)['unchanged'], 6)
+
+    def test_removed_entries_are_kept_while_their_file_exists(self):
+        snapshot = self.snapshot_plan()
+        gone, kept = self.resources(0).pop(0), self.resources(0).pop(0)
+        write_json(self.json_path, self.course)
+        os.remove(snapshot[gone['resource']['fileUrl']]['path'])
+        engine.save_course_snapshot("Plan Course", engine.load_course_plan(self.json_path).tasks, self.journal, snapshot)
+        snapshot = engine.load_course_snapshot("Plan Course")
+        self.assertNotIn(gone['resource']['fileUrl'], snapshot)
+        self.assertTrue(snapshot[kept['resource']['fileUrl']]['removed'])
+        self.assertEqual(engine.load_course_plan(self.json_path).diff(snapshot)['removed'], [kept['resource']['fileUrl']])
+
+    def test_older_snapshot_formats_never_force_a_download(self):
+        plan = engine.load_course_plan(self.json_path)
+        for legacy in ({t.id: "0123456789abcdef" for t in plan.tasks}, {t.id: {'fingerprint': "0123456789abcdef", 'complete': True, 'path': os.path.join(t.save_dir, t.filename)} for t in plan.tasks}):
+            write_json(os.path.join("Plan Course", engine.COURSE_SNAPSHOT_FILE), legacy)
+            changes = plan.diff(engine.load_course_snapshot("Plan Course"))
+            self.assertEqual((changes['added'], changes['changed'], changes['moved'], changes['unchanged']), ([], [], [], 6))
+
+    def test_plan_is_reused_until_the_content_changes(self):
+        plan = engine.load_course_plan(self.json_path); plan.tasks
+        self.assertIs(engine.load_course_plan(self.json_path), plan)
+        os.utime(self.json_path, ns=(0, 0))
+        self.assertIs(engine.load_course_plan(self.json_path), plan)
+        self.resources(0).pop(); write_json(self.json_path, self.course)
+        fresh = engine.load_course_plan(self.json_path)
+        self.assertIsNot(fresh, plan); self.assertEqual(len(fresh.tasks), 5)
+
+    def test_read_only_journal_touches_nothing(self):
+        missing = os.path.join(self.work_dir, "never downloaded")
+        self.assertEqual(engine.DownloadJournal.read(missing).entries, {})
+        self.assertFalse(os.path.exists(missing))
+        os.makedirs("Legacy Course")
+        with open(os.path.join("Legacy Course", engine.LEGACY_DOWNLOAD_LOG_FILE), 'w', encoding='utf-8') as f: f.write("a\n")
+        self.assertEqual(list(engine.DownloadJournal.read("Legacy Course").entries), ['a'])
+        self.assertEqual(os.listdir("Legacy Course"), [engine.LEGACY_DOWNLOAD_LOG_FILE])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+
+import engine
+
+def journal_lines(course_dir):
+    with open(os.path.join(course_dir, engine.DOWNLOAD_JOURNAL_FILE), 'r', encoding='utf-8') as f: return f.read().splitlines(keepends=True)
+
+# DownloadJournal replay, recovery and compaction on a scratch course folder.
+class DownloadJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.course_dir = tempfile.mkdtemp(prefix="journal-"); self.addCleanup(shutil.rmtree, self.course_dir, True)
+    def open(self):
+        journal = engine.DownloadJournal(self.course_dir); self.addCleanup(journal.close)
+        return journal
+    def task(self, name, content=b"x" * 1000):
+        with open(os.path.join(self.course_dir, name), 'wb') as f: f.write(content)
+        return engine.Task(name, 'video', name, self.course_dir, name, name, "fp")
+
+    def test_last_record_for_an_id_wins_on_replay(self):
+        journal = self.open()
+        journal.record('a', 'downloading'); journal.record('a', 'done', size=1); journal.record('b', 'failed', reason='boom'); journal.close()
+        entries = self.open().entries
+        self.assertEqual((entries['a']['state'], entries['a']['size']), ('done', 1))
+        self.assertEqual((entries['b']['state'], entries['b']['reason']), ('failed', 'boom'))
+
+    def test_torn_final_line_is_dropped_and_compacted(self):
+        journal = self.open(); journal.record('a', 'done', size=1); journal.close()
+        with open(os.path.join(self.course_dir, engine.DOWNLOAD_JOURNAL_FILE), 'a', encoding='utf-8') as f: f.write('{"id": "b", "sta')
+        self.assertEqual(list(self.open().entries), ['a'])
+        lines = journal_lines(self.course_dir)
+        self.assertEqual([json.loads(line)['id'] for line in lines], ['a']); self.assertTrue(lines[-1].endswith('\n'))
+
+    def test_long_history_is_compacted_on_open(self):
+        journal = self.open()
+        for i in range(150): journal.record('a', 'downloading', attempt=i)
+        journal.record('a', 'done'); journal.close()
+        self.assertEqual(len(journal_lines(self.course_dir)), 151)
+        self.assertEqual(self.open().entries['a']['state'], 'done')
+        self.assertEqual(len(journal_lines(self.course_dir)), 1)
+
+    def test_legacy_log_is_imported_as_manual_entries(self):
+        with open(os.path.join(self.course_dir, engine.LEGACY_DOWNLOAD_LOG_FILE), 'w', encoding='utf-8') as f: f.write("a\n\nb\n")
+        journal = self.open()
+        self.assertEqual(sorted(journal.entries), ['a', 'b'])
+        self.assertTrue(all(rec['source'] == 'manual' for rec in journal.entries.values()))
+        self.assertTrue(journal.is_complete(engine.Task('a', 'video', 'a', self.course_dir, "missing.mp4", "missing.mp4", "fp")))
+        self.assertEqual(len(journal_lines(self.course_dir)), 2)
+
+    def test_completion_is_checked_against_the_file(self):
+        journal, task = self.open(), self.task("a.mp4")
+        journal.record_done(task)
+        self.assertTrue(journal.is_complete(task))
+        open(os.path.join(self.course_dir, "a.mp4.aria2"), 'w').close()
+        self.assertFalse(journal.is_complete(task))
+        os.remove(os.path.join(self.course_dir, "a.mp4.aria2")); self.task("a.mp4", b"short")
+        self.assertFalse(journal.is_complete(task))
+
+if __name__ == '__main__':
+    unittest.main()
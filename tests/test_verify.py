@@ -0,0 +1,92 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [TESTS_DIR, os.path.dirname(TESTS_DIR), os.path.join(os.path.dirname(TESTS_DIR), 'bench')]
+
+import engine
+import fixtures
+import stand_in
+import support
+
+# verify_tasks on files recorded in a scratch journal. Every video has an expected size in its journal
+# entry, so no server size lookup is made.
+class VerifyTasksTest(unittest.TestCase):
+    def setUp(self):
+        self.course_dir = tempfile.mkdtemp(prefix="verify-"); self.addCleanup(shutil.rmtree, self.course_dir, True)
+        self.journal = engine.DownloadJournal(self.course_dir); self.addCleanup(self.journal.close)
+        self.tasks = {name: engine.Task(name, 'video', name, self.course_dir, f"{name}.mp4", f"{name}.mp4", "fp") for name in ('good', 'grown', 'tampered', 'partial', 'missing', 'pending')}
+        for name, t in self.tasks.items():
+            if name == 'pending': continue
+            self.write(name, b"v" * 4096); self.journal.record_done(t, expected_size=4096)
+        self.write('grown', b"v" * 4097); self.write('tampered', b"w" * 4096)
+        open(self.path('partial') + '.aria2', 'w').close(); os.remove(self.path('missing'))
+    def path(self, name): return os.path.join(self.course_dir, f"{name}.mp4")
+    def write(self, name, content):
+        with open(self.path(name), 'wb') as f: f.write(content)
+    def verify(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()): return engine.verify_tasks(list(self.tasks.values()), self.journal, workers=1, **kwargs)
+
+    def test_each_kind_of_damage_is_reported(self):
+        results = self.verify()
+        self.assertEqual(results['good'], ('ok', None))
+        self.assertEqual(results['grown'], ('failed', "size 4097 != 4096"))
+        self.assertEqual(results['tampered'], ('failed', 'checksum mismatch'))
+        self.assertEqual(results['partial'], ('failed', 'incomplete'))
+        self.assertEqual(results['missing'], ('failed', 'missing'))
+        self.assertEqual(results['pending'], ('skipped', 'not downloaded'))
+
+    def test_unchanged_files_are_not_hashed_again(self):
+        self.verify()
+        with mock.patch.object(engine, 'sha256_file', side_effect=AssertionError("hashed")): results = self.verify()
+        self.assertEqual(results['good'], ('ok', 'cached'))
+        self.write('good', b"x" * 4096)
+        self.assertEqual(self.verify()['good'], ('failed', 'checksum mismatch'))
+
+    def test_stopping_still_reports_every_task(self):
+        results = self.verify(should_stop=lambda: True)
+        self.assertEqual(set(results), set(self.tasks))
+        self.assertEqual(results['good'], ('skipped', 'stopped'))
+
+# run_verify followed by its re-download, against the bench file server and tests/fake_aria2c.py.
+@unittest.skipIf(os.name == 'nt', "fake aria2c launcher is a shell script")
+class RunVerifyTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = stand_in.StandInServer(stand_in.StandInConfig(video_size=64 * 1024, doc_size=8 * 1024)).start()
+        cls.bin_dir = support.fake_aria2c_dir()
+    @classmethod
+    def tearDownClass(cls): cls.server.stop(); shutil.rmtree(cls.bin_dir, ignore_errors=True)
+    def setUp(self):
+        self.work_dir, cwd = tempfile.mkdtemp(prefix="verify-run-"), os.getcwd()
+        os.chdir(self.work_dir); self.addCleanup(os.chdir, cwd); self.addCleanup(shutil.rmtree, self.work_dir, True)
+        for patcher in (mock.patch.dict(os.environ, {'PATH': self.bin_dir + os.pathsep + os.environ.get('PATH', '')}),
+                        mock.patch.object(engine, 'BASE_PRESIGNED_URL', f"{self.server.base_url}/api/v1/files/presigned/"),
+                        mock.patch.object(engine, 'BASE_DOC_URL', f"{self.server.base_url}/api/v1/files/"),
+                        mock.patch.object(engine, 'ARIA2_POLL_INTERVAL', 0.05)):
+            patcher.start(); self.addCleanup(patcher.stop)
+
+    def test_redownload_fetches_only_the_rejected_files(self):
+        json_path, course = os.path.join(self.work_dir, "course.json"), fixtures.make_course(6, lessons_per_chapter=3, title="Verify Course")
+        with open(json_path, 'w', encoding='utf-8') as f: json.dump(course, f)
+        with contextlib.redirect_stdout(io.StringIO()): self.assertEqual(engine.run_download(json_path, "token", workers=2)['done'], 6)
+        course['course']['chapters'][0]['lessons'][0]['lesson']['resources'].append({'resource': {'type': 'document', 'title': "new.pdf", 'fileUrl': "document-new"}, 'order': 5})
+        with open(json_path, 'w', encoding='utf-8') as f: json.dump(course, f)
+        tasks = {t.id: t for t in engine.load_course_plan(json_path).tasks}
+        with open(os.path.join(tasks['video-00000'].save_dir, tasks['video-00000'].filename), 'ab') as f: f.write(b"junk")
+        os.remove(os.path.join(tasks['document-00003'].save_dir, tasks['document-00003'].filename))
+        with contextlib.redirect_stdout(io.StringIO()): summary = engine.run_verify(json_path, "token", workers=1, redownload=True, download_options={'workers': 2})
+        self.assertEqual(sorted(summary['queued_ids']), ['document-00003', 'video-00000'])
+        self.assertEqual(sorted(summary['download']['states']), ['document-00003', 'video-00000'])
+        self.assertEqual(summary['download']['done'], 2)
+        self.assertFalse(os.path.exists(os.path.join(tasks['document-new'].save_dir, tasks['document-new'].filename)))
+
+if __name__ == '__main__':
+    unittest.main()